@@ -2,7 +2,7 @@
 # Origem: Gestor Financeiro v1 + Gestor de Metas v4 (unificados em um único app Streamlit)
 #
 # Como rodar:
-#   pip install streamlit pandas bcrypt cryptography plotly
+#   pip install streamlit pandas bcrypt cryptography plotly orjson
 #   streamlit run Atlas_Life_v3_unificado.py
 #   streamlit run "src\Development\Atlas Life - v0.6.0-dev.py"
 #
@@ -10,30 +10,39 @@
 # - Este app usa um NOVO banco SQLite por padrão: db/Development/atlas_life_v0.6.0-dev.db
 # - Ele não migra automaticamente os DBs antigos (atlas_life_v1.db e atlas_secure_v2.db).
 #   Se quiser, peça que eu gere um script de migração 100% automático.
+#
+# Variáveis de ambiente:
+# - ATLAS_PBKDF2_ITERATIONS: iterações do PBKDF2 para contas novas (padrão 600000, recomendação
+#   OWASP para PBKDF2-HMAC-SHA256). Contas existentes continuam com o valor gravado no cadastro.
 
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 import sqlite3
 import pandas as pd
+import numpy as np
 import bcrypt
 import math
-import json
+import orjson
 import base64
+import bisect
 import os
-from datetime import datetime
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, time
+from functools import lru_cache
+from types import MappingProxyType
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-import plotly.express as px
-import plotly.graph_objects as go
 
 from io import BytesIO
 
-# PDF (ReportLab)
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import cm
+# Plotly e ReportLab são importados só onde são usados (gráficos / exportação em PDF):
+# a sessão que não abre essas telas não paga o custo de importação
 
 # ---------------------------
 # EXPORTAÇÕES
@@ -44,16 +53,24 @@ def parse_tx_datetime(series_or_value):
     Converte datas de transações para datetime de forma robusta.
     - Prioriza ISO (2026-01-25T09:15:00)
     - Tenta dayfirst para casos antigos (25/01/2026 09:15)
+    O caminho ISO usa formato fixo (sem inferência via dateutil); só o que falhar cai no dayfirst.
     """
     try:
-        dt = pd.to_datetime(series_or_value, errors="coerce")
+        if isinstance(series_or_value, str):
+            try:
+                return pd.Timestamp(datetime.fromisoformat(series_or_value))
+            except ValueError:
+                pass
+
+        dt = pd.to_datetime(series_or_value, errors="coerce", format="ISO8601", cache=True)
         if isinstance(dt, pd.Series):
             mask = dt.isna()
             if mask.any():
                 dt.loc[mask] = pd.to_datetime(series_or_value.loc[mask], errors="coerce", dayfirst=True)
             return dt
         else:
-            if pd.isna(dt):
+            # escalar com errors="coerce": ou Timestamp ou o singleton NaT (None quando a entrada é None)
+            if dt is pd.NaT or dt is None:
                 dt = pd.to_datetime(series_or_value, errors="coerce", dayfirst=True)
             return dt
     except Exception:
@@ -71,15 +88,19 @@ def clamp_date(d, min_d, max_d):
     return d
 
 
-def choose_line_freq(start_ts, end_ts) -> str:
+_NS_PER_DAY = 86_400 * 10**9
+
+def choose_line_freq(start_ts: pd.Timestamp, end_ts: pd.Timestamp) -> str:
     """
     Frequência para gráficos de linha (evolução):
     - até 60 dias: diário
     - até 2 anos: semanal
     - acima: mensal
+    Recebe Timestamps já prontos (os filtros de período já os têm); a conversão fica com quem chama.
     """
     try:
-        span_days = (pd.to_datetime(end_ts) - pd.to_datetime(start_ts)).days
+        # diferença em ns inteiros (Timestamp.value), sem montar um Timedelta só para ler .days
+        span_days = (end_ts.value - start_ts.value) // _NS_PER_DAY
     except Exception:
         span_days = 30
 
@@ -97,22 +118,95 @@ def normalize_start_end(start_d, end_d):
     return start_d, end_d
 
 
+_END_OF_DAY = pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+
+@lru_cache(maxsize=32)
+def date_range_bounds(start_d, end_d) -> tuple[pd.Timestamp, pd.Timestamp]:
+    """(início 00:00:00, fim 23:59:59) de um intervalo de datas; Timestamps são imutáveis, então ficam em cache."""
+    return pd.Timestamp(start_d), pd.Timestamp(end_d) + _END_OF_DAY
+
+
+def period_slice(data_fmt: pd.Series, start_ts: pd.Timestamp, end_ts: pd.Timestamp) -> slice:
+    """
+    Posições de [start_ts, end_ts] numa coluna data_fmt ORDENADA (como vem de get_financial_df):
+    duas buscas binárias em vez de uma máscara booleana sobre a coluna inteira.
+    """
+    lo = int(data_fmt.searchsorted(start_ts, side="left"))
+    hi = int(data_fmt.searchsorted(end_ts, side="right"))
+    return slice(lo, max(lo, hi))
+
+
+# troca ',' <-> '.' em um único passe (1,234.56 -> 1.234,56)
+_BRL_TABLE = str.maketrans({",": ".", ".": ","})
+
 def _brl(v: float) -> str:
     try:
-        s = f"{float(v):,.2f}"
-        # 1.234,56 (pt-br)
-        s = s.replace(",", "X").replace(".", ",").replace("X", ".")
-        return f"R$ {s}"
+        return f"R$ {float(v):,.2f}".translate(_BRL_TABLE)
     except Exception:
         return "R$ 0,00"
 
 
+@st.cache_resource(show_spinner=False)
+def _get_export_executor() -> ThreadPoolExecutor:
+    # o PDF (ReportLab) é montado aqui enquanto o script serializa CSV/Excel
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="atlas-export")
+
+
+@st.cache_resource(show_spinner=False)
+def _pdf_styles():
+    # stylesheet da ReportLab (~20 ParagraphStyle): só leitura, montado uma vez por processo
+    from reportlab.lib.styles import getSampleStyleSheet
+    return getSampleStyleSheet()
+
+
+@st.cache_resource(show_spinner=False)
+def _pdf_base_table_style():
+    # comandos fixos da tabela; build_transactions_pdf herda numa cópia (TableStyle(parent=...))
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+
+    return TableStyle([
+        # Cabeçalho
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#111827")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, 0), 10),
+
+        # Corpo (fundo claro + texto escuro)
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f3f4f6")]),
+        ("TEXTCOLOR", (0, 1), (-1, -1), colors.HexColor("#111827")),
+        ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
+        ("FONTSIZE", (0, 1), (-1, -1), 9),
+
+        # Alinhamentos
+        ("ALIGN", (0, 0), (-1, 0), "LEFT"),
+        ("ALIGN", (4, 1), (4, -1), "RIGHT"),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+
+        # “Espaçamento” pra respirar
+        ("TOPPADDING", (0, 0), (-1, -1), 6),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+        ("LEFTPADDING", (0, 0), (-1, -1), 6),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 6),
+
+        # Bordas leves
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#d1d5db")),
+    ])
+
+
+# chamado por build_export_files (que já guarda o resultado em cache por usuário/versão/filtros)
 def build_transactions_pdf(
     df: pd.DataFrame,
     username: str,
     period_label: str,
     keyword_label: str,
 ) -> bytes:
+    # PDF (ReportLab)
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib import colors
+    from reportlab.lib.units import cm
+
     buf = BytesIO()
     doc = SimpleDocTemplate(
         buf,
@@ -124,7 +218,7 @@ def build_transactions_pdf(
         title="Atlas Life — Exportação de Transações",
     )
 
-    styles = getSampleStyleSheet()
+    styles = _pdf_styles()
     story = []
 
     title = Paragraph("<b>Atlas Life — Transações (Exportação)</b>", styles["Title"])
@@ -159,8 +253,7 @@ def build_transactions_pdf(
 
     # resumo
     try:
-        entradas = dfp[dfp["tipo"] == "Entrada"]["valor"].astype(float).sum()
-        saidas = dfp[dfp["tipo"] == "Saída"]["valor"].astype(float).sum()
+        entradas, saidas = sum_entradas_saidas(dfp["tipo"], dfp["valor"].astype(float))
         balanco = entradas - saidas
     except Exception:
         entradas = saidas = balanco = 0.0
@@ -184,63 +277,42 @@ def build_transactions_pdf(
         if c not in dfp.columns:
             dfp[c] = ""
 
-    table_data = [["Data", "Tipo", "Categoria", "Descrição", "Valor", "Tempo"]]
-    for _, r in dfp.iterrows():
-        dtp = parse_tx_datetime(r.get("data", ""))
-        data_txt = dtp.strftime("%d/%m/%Y %H:%M") if not pd.isna(dtp) else str(r.get("data", ""))[:16]
-        tipo = str(r.get("tipo", ""))
-        cat = str(r.get("categoria", ""))
-        desc = str(r.get("descricao", ""))
-        val = _brl(r.get("valor", 0.0))
-        tempo = str(r.get("tempo", "-"))
-        table_data.append([data_txt, tipo, cat, desc, val, tempo])
+    # formatação das linhas em um passe vetorizado (um parse de datas para a coluna inteira,
+    # a menos que a data já venha formatada em data_txt)
+    if "data_txt" in dfp.columns:
+        data_txt = dfp["data_txt"]
+    else:
+        data_raw = dfp["data"].fillna("").astype(str)
+        data_txt = parse_tx_datetime(data_raw).dt.strftime("%d/%m/%Y %H:%M").fillna(data_raw.str.slice(0, 16))
+    rows_fmt = pd.DataFrame({
+        "data": data_txt,
+        "tipo": dfp["tipo"].astype(object),          # categórico -> object, para o fillna("") abaixo
+        "categoria": dfp["categoria"].astype(object),
+        "descricao": dfp["descricao"],
+        "valor": dfp["valor"].map(_brl),
+        "tempo": dfp["tempo"],
+    }).fillna({"tipo": "", "categoria": "", "descricao": "", "tempo": "-"}).astype(str)
+
+    table_data = [["Data", "Tipo", "Categoria", "Descrição", "Valor", "Tempo"]] + rows_fmt.values.tolist()
 
     tbl = Table(table_data, colWidths=[2.1*cm, 2.0*cm, 3.0*cm, 7.4*cm, 2.6*cm, 2.2*cm])
 
-    # Estilo base (claro e legível)
-    style = TableStyle([
-        # Cabeçalho
-        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#111827")),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTSIZE", (0, 0), (-1, 0), 10),
-
-        # Corpo (fundo claro + texto escuro)
-        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f3f4f6")]),
-        ("TEXTCOLOR", (0, 1), (-1, -1), colors.HexColor("#111827")),
-        ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
-        ("FONTSIZE", (0, 1), (-1, -1), 9),
-
-        # Alinhamentos
-        ("ALIGN", (0, 0), (-1, 0), "LEFT"),
-        ("ALIGN", (4, 1), (4, -1), "RIGHT"),
-        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-
-        # “Espaçamento” pra respirar
-        ("TOPPADDING", (0, 0), (-1, -1), 6),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
-        ("LEFTPADDING", (0, 0), (-1, -1), 6),
-        ("RIGHTPADDING", (0, 0), (-1, -1), 6),
-
-        # Bordas leves
-        ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#d1d5db")),
-    ])
-
-    # Colorir "Tipo" e "Valor" por linha (Entrada verde, Saída vermelho)
-    for i in range(1, len(table_data)):  # começa em 1 porque 0 é o header
-        tipo_txt = str(table_data[i][1]).strip().lower()
-        if "entrada" in tipo_txt:
-            cor = colors.HexColor("#16a34a")  # verde
-        else:
-            cor = colors.HexColor("#dc2626")  # vermelho
+    # Estilo base (claro e legível) + cores por linha adicionadas abaixo, numa cópia do template
+    style = TableStyle(parent=_pdf_base_table_style())
 
-        # coluna "Tipo"
-        style.add("TEXTCOLOR", (1, i), (1, i), cor)
-        style.add("FONTNAME", (1, i), (1, i), "Helvetica-Bold")
+    # Colorir "Tipo" e "Valor" (Entrada verde, Saída vermelho): um comando por sequência contígua
+    # de linhas com a mesma cor, em vez de 4 comandos por linha
+    style.add("FONTNAME", (1, 1), (1, -1), "Helvetica-Bold")
+    style.add("FONTNAME", (4, 1), (4, -1), "Helvetica-Bold")
 
-        # coluna "Valor"
-        style.add("TEXTCOLOR", (4, i), (4, i), cor)
-        style.add("FONTNAME", (4, i), (4, i), "Helvetica-Bold")
+    is_entrada = rows_fmt["tipo"].str.strip().str.lower().str.contains("entrada", regex=False).to_numpy()
+    run_starts = np.r_[0, np.flatnonzero(np.diff(is_entrada)) + 1]
+    run_ends = np.r_[run_starts[1:], len(is_entrada)] - 1
+    for start, end in zip(run_starts.tolist(), run_ends.tolist()):
+        cor = colors.HexColor("#16a34a") if is_entrada[start] else colors.HexColor("#dc2626")  # verde / vermelho
+        # +1 porque a linha 0 é o header
+        style.add("TEXTCOLOR", (1, start + 1), (1, end + 1), cor)  # coluna "Tipo"
+        style.add("TEXTCOLOR", (4, start + 1), (4, end + 1), cor)  # coluna "Valor"
 
     tbl.setStyle(style)
     story.append(tbl)
@@ -248,10 +320,63 @@ def build_transactions_pdf(
     doc.build(story)
     return buf.getvalue()
 
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_export_files(
+    username: str,
+    version: int,
+    start_d,
+    end_d,
+    q: str,
+    _df: pd.DataFrame,
+) -> tuple[bytes, bytes, bytes]:
+    """
+    (CSV, Excel, PDF) das transações filtradas, em cache por (usuário, versão dos dados, filtros):
+    `_df` não é hasheado — ele é inteiramente determinado pelos outros argumentos. Reruns sem
+    mudança de dados/filtros (e quem nunca exporta nada depois do 1º render) não remontam os arquivos.
+    """
+    period_label = f"{start_d.strftime('%d/%m/%Y')} → {end_d.strftime('%d/%m/%Y')}"
+    keyword_label = (q if q else "(vazio)")
+
+    # DataFrame para exportar: uma única seleção de colunas (ordem amigável primeiro);
+    # colunas derivadas (data_fmt / data_txt / signed) ficam fora do arquivo exportado
+    cols_pref = ["data", "tipo", "categoria", "descricao", "valor", "tempo", "id"]
+    cols_internal = {"data_fmt", "data_txt", "signed"}
+    cols_final = [c for c in cols_pref if c in _df.columns] + [
+        c for c in _df.columns if c not in cols_pref and c not in cols_internal
+    ]
+    df_export = _df[cols_final]
+
+    # PDF (estilizado) começa em paralelo; o resultado é coletado depois do Excel
+    pdf_future = _get_export_executor().submit(
+        build_transactions_pdf,
+        df=df_export.assign(data_txt=_df["data_txt"]),  # PDF reaproveita a data já formatada
+        username=username,
+        period_label=period_label,
+        keyword_label=keyword_label,
+    )
+
+    # CSV
+    csv_bytes = df_export.to_csv(index=False).encode("utf-8")
+
+    # Excel
+    xlsx_buf = BytesIO()
+    with pd.ExcelWriter(xlsx_buf, engine="openpyxl") as writer:
+        df_export.to_excel(writer, index=False, sheet_name="Transacoes")
+        # uma aba extra com filtros
+        pd.DataFrame(
+            {
+                "Filtro": ["Período", "Palavra-chave"],
+                "Valor": [period_label, keyword_label],
+            }
+        ).to_excel(writer, index=False, sheet_name="Filtros")
+
+    return csv_bytes, xlsx_buf.getvalue(), pdf_future.result()
+
 # ============================
 # GUIA DE CATEGORIAS (MANUAL)
 # ============================
-CATEGORY_GUIDE = {
+CATEGORY_GUIDE = MappingProxyType({
     # ENTRADAS
     "Salário": "Renda principal recorrente (salário, pró-labore fixo).",
     "Extra": "Entradas não recorrentes (freela, bônus, cashback, vendas, reembolsos).",
@@ -283,9 +408,18 @@ CATEGORY_GUIDE = {
 
     # OUTROS
     "Outros": "Quando não se encaixar nas demais. Evite usar com frequência.",
-}
+})
+
+# categorias disponíveis no lançamento (mesma ordem do guia) + posição de cada uma no selectbox
+CATEGORY_LIST = tuple(CATEGORY_GUIDE)
+CATEGORY_INDEX = MappingProxyType({c: i for i, c in enumerate(CATEGORY_LIST)})
+
+@st.cache_data(show_spinner=False)
+def _category_glossary_md(cats: tuple[str, ...]) -> str:
+    # mini-glossário montado uma vez: um único st.markdown em vez de um por categoria
+    return "\n".join(f"- **{c}**: {CATEGORY_GUIDE.get(c, 'Sem descrição ainda.')}" for c in cats)
 
-def render_category_manual(selected_cat: str, cat_list: list[str]) -> None:
+def render_category_manual(selected_cat: str, cat_list: tuple[str, ...]) -> None:
     """Mostra um manual rápido para ajudar a escolher a categoria."""
     with st.expander("📘 Manual de categorias (ajuda para classificar)", expanded=False):
         st.caption("Dica: escolha a categoria que melhor representa a *natureza* do movimento.")
@@ -298,9 +432,7 @@ def render_category_manual(selected_cat: str, cat_list: list[str]) -> None:
         st.divider()
 
         # Lista completa (mini-glossário)
-        for c in cat_list:
-            txt = CATEGORY_GUIDE.get(c, "Sem descrição ainda.")
-            st.markdown(f"- **{c}**: {txt}")
+        st.markdown(_category_glossary_md(tuple(cat_list)))
 
 # ---------------------------
 # CONFIGURAÇÕES
@@ -308,8 +440,19 @@ def render_category_manual(selected_cat: str, cat_list: list[str]) -> None:
 DB_FILE = "db/Development/atlas_life_v0.6.0-dev.db"
 SALT_FILE = "key/salt.bin"
 
+# Custo do PBKDF2 para contas NOVAS (cada conta guarda o próprio valor em users.kdf_iterations)
+# (a derivação roda uma vez por login — o DataProtector fica no session_state —, então o custo
+# maior não aparece nos reruns)
+LEGACY_PBKDF2_ITERATIONS = 100000
+DEFAULT_PBKDF2_ITERATIONS = 600000
+PBKDF2_ITERATIONS = int(os.environ.get("ATLAS_PBKDF2_ITERATIONS", DEFAULT_PBKDF2_ITERATIONS))
+
+HISTORY_TIPOS = ("Aporte", "Retirada", "Ajuste")  # tipos de registro no histórico das metas
+TX_PAGE_SIZE = 50  # transações exibidas por vez na listagem de Registros
+
 LEVEL_BASE_VALUE = 100.0
 LEVEL_GROWTH_FACTOR = 2.0
+_LOG2_LEVEL_GROWTH = math.log2(LEVEL_GROWTH_FACTOR)  # = 1.0 para fator 2 (log2 puro)
 
 if not os.path.exists("key"):
     os.makedirs("key")
@@ -319,57 +462,135 @@ if not os.path.exists("db"):
 # ---------------------------
 # SEGURANÇA (CRIPTO POR SENHA)
 # ---------------------------
-class DataProtector:
+def load_legacy_salt() -> bytes:
+    """Salt global (key/salt.bin) das contas criadas antes do salt por usuário."""
+    if not os.path.exists(SALT_FILE):
+        salt = os.urandom(16)
+        with open(SALT_FILE, "wb") as f:
+            f.write(salt)
+        return salt
+    with open(SALT_FILE, "rb") as f:
+        return f.read()
+
+
+def _build_ciphers(user_password: str, salt: bytes, iterations: int) -> tuple[AESGCM, Fernet]:
     """
-    Deriva uma chave simétrica a partir da senha do usuário usando PBKDF2HMAC + salt persistido,
-    e usa Fernet para criptografar/decriptar payloads sensíveis armazenados no SQLite.
+    Deriva (PBKDF2HMAC) a chave do usuário e monta os ciphers.
+    - AESGCM: usado em toda gravação nova (chave própria, derivada via HKDF)
+    - Fernet: só para ler registros antigos (tokens base64 em texto)
     """
-    def __init__(self, user_password: str):
-        if not os.path.exists(SALT_FILE):
-            self.salt = os.urandom(16)
-            with open(SALT_FILE, "wb") as f:
-                f.write(self.salt)
-        else:
-            with open(SALT_FILE, "rb") as f:
-                self.salt = f.read()
-
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=self.salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(user_password.encode("utf-8")))
-        self.fernet = Fernet(key)
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=iterations,
+    )
+    master = kdf.derive(user_password.encode("utf-8"))
+    gcm_key = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b"atlas-life/aes-gcm").derive(master)
+    return AESGCM(gcm_key), Fernet(base64.urlsafe_b64encode(master))
 
-    def encrypt(self, data_str: str) -> str:
-        if not data_str:
-            return ""
-        return self.fernet.encrypt(data_str.encode("utf-8")).decode("utf-8")
 
-    def decrypt(self, encrypted_str: str):
+class DataProtector:
+    """
+    Deriva uma chave simétrica a partir da senha do usuário usando PBKDF2HMAC + salt do próprio usuário
+    (coluna users.salt), e usa AES-GCM para criptografar/decriptar payloads sensíveis armazenados no SQLite.
+    Formato gravado: BLOB = nonce (12 bytes) + ciphertext/tag. Valores em texto são tokens Fernet
+    antigos e continuam legíveis; são regravados em AES-GCM na próxima escrita.
+    A derivação roda uma vez por objeto; o do login fica no st.session_state (só daquela sessão),
+    então os reruns não re-derivam e a chave some junto com a sessão.
+    """
+    def __init__(self, username: str, user_password: str, salt: bytes | None = None, iterations: int | None = None):
+        # contas antigas (sem salt/iterações próprios) continuam usando os parâmetros legados
+        self.salt = salt if salt else load_legacy_salt()
+        self.iterations = int(iterations) if iterations else LEGACY_PBKDF2_ITERATIONS
+        self.username = username
+        self.aead, self.fernet = _build_ciphers(user_password, self.salt, self.iterations)
+
+    def encrypt(self, data: str | bytes) -> bytes:
+        if not data:
+            return b""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        nonce = os.urandom(12)
+        return nonce + self.aead.encrypt(nonce, data, None)
+
+    def _decrypt_bytes(self, encrypted) -> bytes | None:
         try:
-            if not encrypted_str:
-                return ""
-            return self.fernet.decrypt(encrypted_str.encode("utf-8")).decode("utf-8")
+            if not encrypted:
+                return b""
+            if isinstance(encrypted, str):  # legado (Fernet)
+                return self.fernet.decrypt(encrypted.encode("utf-8"))
+            encrypted = bytes(encrypted)
+            return self.aead.decrypt(encrypted[:12], encrypted[12:], None)
         except Exception:
             return None
-        
-def compute_current_balance(username, protector) -> float:
-    """Saldo atual = entradas - saídas (inclui ajustes e qualquer transação salva)."""
-    all_items = get_financial_items(username, protector)
-    if not all_items:
-        return 0.0
 
-    df = pd.DataFrame(all_items)
+    def decrypt(self, encrypted):
+        raw = self._decrypt_bytes(encrypted)
+        return raw.decode("utf-8") if raw is not None else None
+
+    def encrypt_json(self, obj) -> bytes:
+        """Serializa com orjson (bytes direto, sem passar por str) e criptografa."""
+        return self.encrypt(orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY))
+
+    def decrypt_json(self, encrypted):
+        """Decripta e desserializa; None se o payload estiver vazio, corrompido ou com outra chave."""
+        raw = self._decrypt_bytes(encrypted)
+        if not raw:
+            return None
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            return None
+        
+def sum_entradas_saidas(tipo, valor) -> tuple[float, float]:
+    """
+    (entradas, saídas) direto nos arrays NumPy: uma conversão de `valor` e duas máscaras,
+    sem materializar um DataFrame filtrado para cada tipo. NaN é ignorado (como no .sum() do pandas).
+    Com `tipo` categórico: um único bincount sobre os códigos soma todos os tipos de uma vez.
+    """
+    valor = np.asarray(valor, dtype=float)
+    if isinstance(getattr(tipo, "dtype", None), pd.CategoricalDtype):
+        # código -1 (NaN) vira 0 e é descartado; o resto cai no índice da categoria + 1
+        sums = np.bincount(
+            tipo.cat.codes.to_numpy() + 1, weights=np.nan_to_num(valor), minlength=len(tipo.cat.categories) + 1
+        )[1:]
+        by_tipo = dict(zip(tipo.cat.categories, sums.tolist()))
+        return float(by_tipo.get("Entrada", 0.0)), float(by_tipo.get("Saída", 0.0))
+    tipo = np.asarray(tipo, dtype=object)
+    return float(np.nansum(valor[tipo == "Entrada"])), float(np.nansum(valor[tipo == "Saída"]))
+
+def contains_ci(s: pd.Series, q: str) -> np.ndarray:
+    """
+    Máscara "q está contido em s" (minúsculas, substring literal, NaN = não). Com `s` categórico
+    a busca roda só nas categorias distintas e é mapeada de volta pelos códigos.
+    """
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        cats = s.cat.categories.astype(str).str.lower()
+        hit = np.append(np.asarray(cats.str.contains(q, regex=False), dtype=bool), False)  # código -1 (NaN) -> False
+        return hit[s.cat.codes.to_numpy()]
+    return s.fillna("").astype(str).str.lower().str.contains(q, regex=False).to_numpy(dtype=bool)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _compute_current_balance_cached(
+    username: str, version: int, exclude_id: str | None, _protector: DataProtector
+) -> float:
+    # `version` só participa da chave do cache; `_protector` não é hasheado pelo Streamlit
+    df = get_financial_df(username, _protector)
     if df.empty:
         return 0.0
+    if exclude_id is not None:
+        df = df[df["id"] != exclude_id]
 
-    df["valor"] = pd.to_numeric(df.get("valor", 0), errors="coerce").fillna(0.0)
+    return float(df["signed"].sum())
 
-    entradas = df[df.get("tipo") == "Entrada"]["valor"].sum()
-    saidas = df[df.get("tipo") == "Saída"]["valor"].sum()
-    return float(entradas - saidas)
+def compute_current_balance(username, protector, exclude_id: str | None = None) -> float:
+    """
+    Saldo atual = entradas - saídas (inclui ajustes e qualquer transação salva).
+    `exclude_id`: ignora uma transação (a que está sendo editada, na prévia do Novo Lançamento).
+    Em cache pela mesma versão de get_financial_items: só recalcula depois de uma gravação/exclusão.
+    """
+    return _compute_current_balance_cached(username, data_version("financial", username), exclude_id, protector)
 
 
 def help_toggle_button(key: str, title: str, content_md: str):
@@ -392,41 +613,108 @@ def help_toggle_button(key: str, title: str, content_md: str):
 # ---------------------------
 # BANCO DE DADOS
 # ---------------------------
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    # Usuários: mantém hash de senha + perfil criptografado + patrimônio criptografado
-    cursor.execute(
-        '''CREATE TABLE IF NOT EXISTS users (
-            username TEXT PRIMARY KEY,
-            password_hash TEXT NOT NULL,
-            encrypted_profile TEXT,
-            total_patrimony_enc TEXT
-        )'''
-    )
+@st.cache_resource(show_spinner=False)
+def get_conn() -> sqlite3.Connection:
+    """
+    Conexão SQLite única do processo (reaproveitada entre reruns e sessões).
+    - isolation_level=None: as transações são abertas explicitamente em db_transaction()
+    - WAL + synchronous=NORMAL: menos fsync por escrita e leituras não bloqueiam escritas
+    - cache_size=-20000 (~20 MB) + temp_store=MEMORY: páginas e temporários ficam em memória
+    - mmap_size=256 MB: leituras mapeadas direto do arquivo, sem cópia para o page cache do SQLite
+    """
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-20000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")
+    return conn
 
-    # Financeiro: transações e outros itens do módulo financeiro
-    cursor.execute(
-        '''CREATE TABLE IF NOT EXISTS financial_data (
-            id TEXT PRIMARY KEY,
-            owner TEXT NOT NULL,
-            type TEXT NOT NULL,
-            encrypted_payload TEXT NOT NULL
-        )'''
-    )
 
-    # Metas: registros de metas (payload criptografado)
-    cursor.execute(
-        '''CREATE TABLE IF NOT EXISTS goals (
-            id TEXT PRIMARY KEY,
-            owner TEXT NOT NULL,
-            encrypted_payload TEXT NOT NULL
-        )'''
-    )
+@st.cache_resource(show_spinner=False)
+def _get_db_lock() -> threading.RLock:
+    # a conexão é compartilhada entre as threads do Streamlit: transações precisam ser exclusivas
+    return threading.RLock()
+
+
+@contextmanager
+def db_transaction(immediate: bool = False):
+    """
+    Agrupa vários comandos em uma única transação na conexão compartilhada.
+    immediate=True reserva a escrita já no BEGIN (leitura + escrita dependentes).
+    """
+    conn = get_conn()
+    with _get_db_lock():
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+@st.cache_resource(show_spinner=False)
+def _get_data_versions() -> dict:
+    return {}
+
+
+def data_version(kind: str, username: str) -> int:
+    """Versão dos dados (por tipo + usuário), usada como chave dos caches de leitura."""
+    return _get_data_versions().get((kind, username), 0)
+
 
-    conn.commit()
-    conn.close()
+def bump_data_version(kind: str, username: str) -> None:
+    """Invalida os caches de leitura daquele tipo/usuário (chamar após qualquer escrita)."""
+    versions = _get_data_versions()
+    with _get_db_lock():
+        versions[(kind, username)] = versions.get((kind, username), 0) + 1
+
+
+@st.cache_resource(show_spinner=False)
+def init_db():
+    # schema/índices/migrações uma vez por processo (não a cada rerun do script)
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        # Usuários: mantém hash de senha + perfil criptografado + patrimônio criptografado
+        cursor.execute(
+            '''CREATE TABLE IF NOT EXISTS users (
+                username TEXT PRIMARY KEY,
+                password_hash TEXT NOT NULL,
+                encrypted_profile TEXT,
+                total_patrimony_enc TEXT,
+                salt BLOB,
+                kdf_iterations INTEGER
+            )'''
+        )
+
+        # DBs antigos: adiciona os parâmetros de KDF por usuário (NULL = usa salt global / 100k legados)
+        user_cols = {row[1] for row in cursor.execute("PRAGMA table_info(users)")}
+        for col, col_type in (("salt", "BLOB"), ("kdf_iterations", "INTEGER")):
+            if col not in user_cols:
+                cursor.execute(f"ALTER TABLE users ADD COLUMN {col} {col_type}")
+
+        # Financeiro: transações e outros itens do módulo financeiro
+        cursor.execute(
+            '''CREATE TABLE IF NOT EXISTS financial_data (
+                id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                type TEXT NOT NULL,
+                encrypted_payload TEXT NOT NULL
+            )'''
+        )
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_fd_owner_type ON financial_data(owner, type)")
+
+        # Metas: registros de metas (payload criptografado)
+        cursor.execute(
+            '''CREATE TABLE IF NOT EXISTS goals (
+                id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                encrypted_payload TEXT NOT NULL
+            )'''
+        )
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_goals_owner ON goals(owner)")
 
 init_db()
 
@@ -446,141 +734,321 @@ def default_profile():
         },
     }
 
-def get_user_profile(username: str, protector: DataProtector):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT encrypted_profile FROM users WHERE username = ?", (username,))
-    res = c.fetchone()
-    conn.close()
+@st.cache_data(show_spinner=False, max_entries=64)
+def _get_user_profile_cached(username: str, version: int, _protector: DataProtector):
+    # `version` só participa da chave do cache; `_protector` não é hasheado pelo Streamlit
+    res = get_conn().execute("SELECT encrypted_profile FROM users WHERE username = ?", (username,)).fetchone()
 
     if res and res[0]:
-        dec = protector.decrypt(res[0])
-        if dec:
-            try:
-                return json.loads(dec)
-            except Exception:
-                return default_profile()
+        prof = _protector.decrypt_json(res[0])
+        if prof is not None:
+            return prof
     return default_profile()
 
+def get_user_profile(username: str, protector: DataProtector):
+    """Perfil decriptado (em cache até o próximo save_user_profile); lido em todo rerun pela sidebar."""
+    return _get_user_profile_cached(username, data_version("profile", username), protector)
+
 def save_user_profile(username: str, profile: dict, protector: DataProtector):
-    enc_profile = protector.encrypt(json.dumps(profile))
-    conn = sqlite3.connect(DB_FILE)
-    conn.execute("UPDATE users SET encrypted_profile = ? WHERE username = ?", (enc_profile, username))
-    conn.commit()
-    conn.close()
+    enc_profile = protector.encrypt_json(profile)
+    with db_transaction() as conn:
+        conn.execute("UPDATE users SET encrypted_profile = ? WHERE username = ?", (enc_profile, username))
+    bump_data_version("profile", username)
 
 # ---------------------------
 # FINANCEIRO (TRANSAÇÕES)
 # ---------------------------
-def get_financial_items(username: str, protector: DataProtector, item_type: str = "transaction"):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute(
+@st.cache_data(show_spinner=False, max_entries=64)
+def _get_financial_items_cached(username: str, item_type: str, version: int, _protector: DataProtector):
+    # `version` só participa da chave do cache; `_protector` não é hasheado pelo Streamlit
+    rows = get_conn().execute(
         "SELECT encrypted_payload FROM financial_data WHERE owner = ? AND type = ?",
         (username, item_type),
-    )
-    rows = c.fetchall()
-    conn.close()
+    ).fetchall()
 
     items = []
     for (payload,) in rows:
-        dec = protector.decrypt(payload)
-        if dec:
-            try:
-                items.append(json.loads(dec))
-            except Exception:
-                pass
+        item = _protector.decrypt_json(payload)
+        if item is not None:
+            items.append(item)
     return items
 
+def get_financial_items(username: str, protector: DataProtector, item_type: str = "transaction"):
+    """Itens financeiros decriptados (em cache até a próxima gravação/exclusão do usuário)."""
+    return _get_financial_items_cached(username, item_type, data_version("financial", username), protector)
+
+def get_financial_item(username: str, item_id: str, protector: DataProtector) -> dict | None:
+    """Um item pelo id (busca pela chave primária + um único decrypt), sem carregar a lista inteira."""
+    row = get_conn().execute(
+        "SELECT encrypted_payload FROM financial_data WHERE id = ? AND owner = ?",
+        (item_id, username),
+    ).fetchone()
+    return protector.decrypt_json(row[0]) if row else None
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _get_financial_df_cached(username: str, item_type: str, version: int, _protector: DataProtector) -> pd.DataFrame:
+    # `version` só participa da chave do cache; `_protector` não é hasheado pelo Streamlit
+    items = get_financial_items(username, _protector, item_type)
+    if not items:
+        return pd.DataFrame()
+
+    df = pd.DataFrame(items)
+    df["data_fmt"] = parse_tx_datetime(df["data"]) if "data" in df.columns else pd.NaT
+    # guardado em ordem cronológica (datas inválidas/NaT no fim): filtros de período viram
+    # period_slice (busca binária) e a listagem "mais recente primeiro" só inverte a fatia
+    df = df.sort_values("data_fmt", kind="stable", na_position="last", ignore_index=True)
+    # data já formatada para exibição (listagem/PDF), uma vez por versão dos dados ("" se inválida)
+    df["data_txt"] = df["data_fmt"].dt.strftime("%d/%m/%Y %H:%M").fillna("")
+    df["valor"] = pd.to_numeric(df.get("valor", 0), errors="coerce").fillna(0.0)
+    # poucos valores distintos: comparações/somas/filtros por tipo e categoria usam os códigos inteiros
+    # (categorias inferidas dos dados, para não perder nenhuma categoria antiga; NaN continua NaN)
+    for col in ("tipo", "categoria"):
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    # impacto no saldo (+Entrada / -Saída / 0 p/ outros): saldo de qualquer recorte = signed.sum()
+    tipo = df["tipo"].to_numpy(dtype=object) if "tipo" in df.columns else np.full(len(df), None)
+    valor = df["valor"].to_numpy()
+    df["signed"] = np.where(tipo == "Entrada", valor, np.where(tipo == "Saída", -valor, 0.0))
+    return df
+
+def get_financial_df(username: str, protector: DataProtector, item_type: str = "transaction") -> pd.DataFrame:
+    """
+    Itens financeiros já em DataFrame ordenado por data_fmt (parseado — NaT se inválida, no fim —,
+    data_txt formatada, valor numérico, signed = impacto no saldo),
+    em cache pela mesma versão de get_financial_items. Cada chamada recebe a sua cópia.
+    """
+    return _get_financial_df_cached(username, item_type, data_version("financial", username), protector)
+
+INS_FINANCIAL_SQL = "INSERT OR REPLACE INTO financial_data (id, owner, type, encrypted_payload) VALUES (?, ?, ?, ?)"
+
+def save_financial_items_bulk(username: str, items: list[dict], protector: DataProtector, item_type: str = "transaction"):
+    """Gravação em lote: criptografa tudo antes e grava com um executemany em uma única transação."""
+    if not items:
+        return
+    rows = [(it["id"], username, item_type, protector.encrypt_json(it)) for it in items]
+    with db_transaction() as conn:
+        conn.executemany(INS_FINANCIAL_SQL, rows)
+    bump_data_version("financial", username)
+
 def save_financial_item(username: str, item_dict: dict, protector: DataProtector, item_type: str = "transaction"):
-    enc_payload = protector.encrypt(json.dumps(item_dict))
-    conn = sqlite3.connect(DB_FILE)
-    conn.execute(
-        "INSERT OR REPLACE INTO financial_data (id, owner, type, encrypted_payload) VALUES (?, ?, ?, ?)",
-        (item_dict["id"], username, item_type, enc_payload),
-    )
-    conn.commit()
-    conn.close()
+    save_financial_items_bulk(username, [item_dict], protector, item_type)
 
-def delete_financial_item(item_id: str):
-    conn = sqlite3.connect(DB_FILE)
-    conn.execute("DELETE FROM financial_data WHERE id = ?", (item_id,))
-    conn.commit()
-    conn.close()
+def delete_financial_item(username: str, item_id: str):
+    with db_transaction() as conn:
+        conn.execute("DELETE FROM financial_data WHERE id = ? AND owner = ?", (item_id, username))
+    bump_data_version("financial", username)
 
 # ---------------------------
 # METAS (GOALS)
 # ---------------------------
+SELECT_GOALS_SQL = "SELECT encrypted_payload FROM goals WHERE owner = ?"
+SELECT_GOAL_SQL = "SELECT encrypted_payload FROM goals WHERE id = ? AND owner = ?"
+INS_GOAL_SQL = "INSERT OR REPLACE INTO goals (id, owner, encrypted_payload) VALUES (?, ?, ?)"
+UPD_PATRIMONY_SQL = "UPDATE users SET total_patrimony_enc = ? WHERE username = ?"
+
 def get_level_info(total_patrimony: float):
     total_patrimony = max(0.1, float(total_patrimony))
     if total_patrimony < LEVEL_BASE_VALUE:
         return 0, 0, LEVEL_BASE_VALUE - total_patrimony, (total_patrimony / LEVEL_BASE_VALUE)
 
-    level = int(math.log(total_patrimony / LEVEL_BASE_VALUE, LEVEL_GROWTH_FACTOR)) + 1
+    level = int(math.log2(total_patrimony / LEVEL_BASE_VALUE) / _LOG2_LEVEL_GROWTH) + 1
     current_level_min = LEVEL_BASE_VALUE * (LEVEL_GROWTH_FACTOR ** (level - 1))
-    next_level_min = LEVEL_BASE_VALUE * (LEVEL_GROWTH_FACTOR ** level)
+    next_level_min = current_level_min * LEVEL_GROWTH_FACTOR
     needed = next_level_min - total_patrimony
     progress = (total_patrimony - current_level_min) / (next_level_min - current_level_min)
     return level, current_level_min, needed, min(progress, 1.0)
 
-def rebuild_goal_state(goal: dict):
-    """Recalcula o campo 'atual' e o acumulado do histórico para garantir consistência."""
-    current = 0.0
-
-    # ✅ ordena por datetime real (robusto)
-    def _dt_of(x):
-        try:
-            dt = parse_tx_datetime(x.get("data", ""))
-            if pd.isna(dt):
-                return datetime.min
-            # parse_tx_datetime pode devolver Timestamp
-            return dt.to_pydatetime() if hasattr(dt, "to_pydatetime") else dt
-        except Exception:
+def _history_dt(entry: dict):
+    """Chave de ordenação do histórico: datetime real do registro (robusto a formatos antigos)."""
+    try:
+        dt = parse_tx_datetime(entry.get("data", ""))
+        if pd.isna(dt):
             return datetime.min
-
-    goal["historico"].sort(key=_dt_of)
-
-    for entry in goal["historico"]:
-        if entry["tipo"] == "Aporte":
+        # parse_tx_datetime pode devolver Timestamp
+        return dt.to_pydatetime() if hasattr(dt, "to_pydatetime") else dt
+    except Exception:
+        return datetime.min
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _goal_daily_balance_cached(
+    username: str, version: int, goal_id: str, _historico: list[dict]
+) -> tuple[list[str], list[float]]:
+    # `version` + `goal_id` identificam o histórico; `_historico` não é hasheado pelo Streamlit
+    # histórico já está ordenado: o último registro de cada dia é o saldo do dia
+    by_day = {}
+    for e in _historico:
+        data = str(e.get("data", ""))
+        day = data[:10] if data[4:5] == "-" else _history_dt(e).date().isoformat()
+        by_day[day] = e.get("valor_acumulado", 0.0)
+    return list(by_day), list(by_day.values())
+
+def goal_daily_balance(username: str, goal: dict) -> tuple[list[str], list[float]]:
+    """(dias, saldo no fim de cada dia) do histórico da meta, em cache até a próxima gravação de metas."""
+    return _goal_daily_balance_cached(username, data_version("goals", username), goal["id"], goal["historico"])
+
+def insert_history_entry(goal: dict, entry: dict) -> None:
+    """Insere o registro já na posição certa (histórico fica sempre ordenado, sem re-sort)."""
+    bisect.insort(goal["historico"], entry, key=_history_dt)
+
+def rebuild_goal_state(goal: dict, resort: bool = True):
+    """
+    Recalcula o campo 'atual' e o acumulado do histórico para garantir consistência.
+    resort=False pula a ordenação quando a ordem não mudou (inserção via insert_history_entry,
+    exclusão, ou edição que não alterou a data).
+    Retorna (goal, ficou_negativo): o segundo indica se o acumulado ficou < 0 em algum ponto.
+    """
+    current = 0.0
+    ever_negative = False
+
+    # ✅ ordena por datetime real (robusto): um parse vetorizado de todas as datas + argsort estável
+    # (mesma ordem do sort(key=_history_dt): datas inválidas primeiro, empates mantêm a ordem)
+    hist = goal["historico"]
+    if resort and len(hist) > 1:
+        dts = parse_tx_datetime(pd.Series([e.get("data", "") for e in hist], dtype=object))
+        order = np.argsort(dts.fillna(pd.Timestamp.min).to_numpy(), kind="stable")
+        hist[:] = [hist[i] for i in order]
+
+    # acumulado em loop simples: montar arrays NumPy a partir dos dicts e escrever de volta
+    # custa mais do que o próprio cálculo (medido mais lento de 10 a 5000 registros)
+    for entry in hist:
+        tipo = entry["tipo"]
+        if tipo == "Aporte":
             current += entry["valor"]
-        elif entry["tipo"] == "Retirada":
+        elif tipo == "Retirada":
             current -= entry["valor"]
-        elif entry["tipo"] == "Ajuste":
+        elif tipo == "Ajuste":
             current = entry["valor"]
 
         entry["valor_acumulado"] = current
+        if current < 0:
+            ever_negative = True
 
     goal["atual"] = current
-    return goal
+    return goal, ever_negative
+
+def history_editor_df(goal: dict) -> pd.DataFrame:
+    """Histórico da meta como DataFrame para o st.data_editor (mais recentes primeiro)."""
+    hist = goal.get("historico", [])
+    df = pd.DataFrame({
+        "uid": [e.get("uid") for e in hist],
+        "data": parse_tx_datetime(pd.Series([e.get("data", "") for e in hist], dtype=object)),
+        "tipo": [e.get("tipo", "") for e in hist],
+        "valor": [float(e.get("valor", 0.0)) for e in hist],
+        "descricao": [e.get("descricao", "") for e in hist],
+        "valor_acumulado": [float(e.get("valor_acumulado", 0.0)) for e in hist],
+    })
+    return df.iloc[::-1].reset_index(drop=True)
+
+def apply_history_edits(goal: dict, original: pd.DataFrame, edited: pd.DataFrame) -> list[dict] | None:
+    """
+    Aplica as linhas do st.data_editor (edições, inclusões e exclusões) ao histórico da meta.
+    Registros existentes mantêm os demais campos e o texto original da data quando ela não mudou.
+    Retorna o novo histórico (ainda sem recalcular o acumulado) ou None se nada mudou.
+    """
+    old_by_uid = {e["uid"]: e for e in goal.get("historico", [])}
+    old_ts = dict(zip(original["uid"], original["data"]))
 
+    novo = []
+    for row in edited.itertuples(index=False):
+        old = old_by_uid.get(row.uid) if isinstance(row.uid, str) else None
+        entry = dict(old) if old else {"uid": secrets.token_hex(8), "tipo": "Aporte"}
 
-def get_goals(username: str, protector: DataProtector):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT encrypted_payload FROM goals WHERE owner = ?", (username,))
-    rows = c.fetchall()
-    conn.close()
+        ts = row.data
+        if old and (ts == old_ts.get(row.uid) or pd.isna(ts)):
+            data = old.get("data", "")
+        else:
+            data = (datetime.now() if pd.isna(ts) else pd.Timestamp(ts).to_pydatetime()).isoformat()
+
+        entry["data"] = data
+        if row.tipo in HISTORY_TIPOS:
+            entry["tipo"] = row.tipo
+        entry["valor"] = 0.0 if pd.isna(row.valor) else float(row.valor)
+        entry["descricao"] = row.descricao if isinstance(row.descricao, str) else ""
+        novo.append(entry)
+
+    # a tabela mostra os mais recentes primeiro: volta à ordem cronológica (empates na ordem original)
+    novo.reverse()
+
+    def _campos(e: dict):
+        return e.get("data"), e.get("tipo"), float(e.get("valor", 0.0)), e.get("descricao", "")
+
+    if {e["uid"]: _campos(e) for e in novo} == {uid: _campos(e) for uid, e in old_by_uid.items()}:
+        return None
+    return novo
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _get_goals_cached(username: str, version: int, _protector: DataProtector):
+    # `version` só participa da chave do cache; `_protector` não é hasheado pelo Streamlit
+    rows = get_conn().execute(SELECT_GOALS_SQL, (username,)).fetchall()
 
     goals = []
     for (payload,) in rows:
-        dec = protector.decrypt(payload)
-        if dec:
-            try:
-                goals.append(json.loads(dec))
-            except Exception:
-                pass
+        goal = _protector.decrypt_json(payload)
+        if goal is not None:
+            goals.append(goal)
     return goals
 
+def get_goals(username: str, protector: DataProtector):
+    """Metas decriptadas do usuário (em cache até a próxima escrita em goals)."""
+    return _get_goals_cached(username, data_version("goals", username), protector)
+
+def _patrimony_contrib(goal: dict | None) -> float:
+    """Quanto a meta soma no patrimônio global (só metas do tipo 'Patrimônio')."""
+    if not goal or goal.get("tipo") != "Patrimônio":
+        return 0.0
+    return float(goal.get("atual", 0.0))
+
 def save_goal(username: str, goal_dict: dict, protector: DataProtector):
-    enc_payload = protector.encrypt(json.dumps(goal_dict))
-    conn = sqlite3.connect(DB_FILE)
-    conn.execute(
-        "INSERT OR REPLACE INTO goals (id, owner, encrypted_payload) VALUES (?, ?, ?)",
-        (goal_dict["id"], username, enc_payload),
-    )
-    conn.commit()
-    conn.close()
-    sync_global_patrimony(username, protector)
+    """
+    Grava a meta e ajusta o patrimônio global pela diferença (novo - antigo) da própria meta,
+    na mesma transação — sem decriptar todas as metas do usuário.
+    Retorna True se o patrimônio global mudou (a sidebar precisa de um rerun do app inteiro).
+    """
+    enc_payload = protector.encrypt_json(goal_dict)
+    with db_transaction(immediate=True) as conn:
+        old_row = conn.execute(SELECT_GOAL_SQL, (goal_dict["id"], username)).fetchone()
+        old_goal = protector.decrypt_json(old_row[0]) if old_row else None
+
+        conn.execute(INS_GOAL_SQL, (goal_dict["id"], username, enc_payload))
+
+        delta = _patrimony_contrib(goal_dict) - _patrimony_contrib(old_goal)
+        if delta:
+            total = _read_user_patrimony(conn, username, protector) + delta
+            conn.execute(UPD_PATRIMONY_SQL, (protector.encrypt(str(float(total))), username))
+    bump_data_version("goals", username)
+    if delta:
+        bump_data_version("patrimony", username)
+    return bool(delta)
+
+def save_goals(username: str, goals: list[dict], protector: DataProtector):
+    """
+    Gravação em lote (importação/migração): metas + patrimônio global num único BEGIN…COMMIT.
+    Como em save_goal, o patrimônio é ajustado pela diferença das metas gravadas (um SELECT das
+    versões antigas + um executemany), sem reler e decriptar todas as metas depois do commit.
+    """
+    if not goals:
+        return
+    by_id = {g["id"]: g for g in goals}  # INSERT OR REPLACE: vale a última versão de cada id
+    rows = [(gid, username, protector.encrypt_json(g)) for gid, g in by_id.items()]
+    placeholders = ",".join("?" * len(by_id))
+    with db_transaction(immediate=True) as conn:
+        old_rows = conn.execute(
+            f"SELECT encrypted_payload FROM goals WHERE owner = ? AND id IN ({placeholders})",
+            (username, *by_id),
+        ).fetchall()
+
+        conn.executemany(INS_GOAL_SQL, rows)
+
+        delta = sum(_patrimony_contrib(g) for g in by_id.values()) - sum(
+            _patrimony_contrib(protector.decrypt_json(payload)) for (payload,) in old_rows
+        )
+        if delta:
+            total = _read_user_patrimony(conn, username, protector) + delta
+            conn.execute(UPD_PATRIMONY_SQL, (protector.encrypt(str(float(total))), username))
+    bump_data_version("goals", username)
+    if delta:
+        bump_data_version("patrimony", username)
 
 def delete_goal(username: str, goal_id: str, protector: DataProtector):
     metas = get_goals(username, protector)
@@ -589,18 +1057,15 @@ def delete_goal(username: str, goal_id: str, protector: DataProtector):
     if meta and meta.get("is_default"):
         return  # simplesmente ignora
 
-    conn = sqlite3.connect(DB_FILE)
-    conn.execute("DELETE FROM goals WHERE id = ?", (goal_id,))
-    conn.commit()
-    conn.close()
-    sync_global_patrimony(username, protector)
-
-def get_user_patrimony(username: str, protector: DataProtector):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT total_patrimony_enc FROM users WHERE username = ?", (username,))
-    res = c.fetchone()
-    conn.close()
+    with db_transaction() as conn:
+        conn.execute("DELETE FROM goals WHERE id = ?", (goal_id,))
+    bump_data_version("goals", username)
+    # reaproveita a lista já decriptada (sem a meta excluída) em vez de ler tudo de novo
+    sync_global_patrimony(username, protector, [m for m in metas if m["id"] != goal_id])
+
+def _read_user_patrimony(conn: sqlite3.Connection, username: str, protector: DataProtector) -> float:
+    # leitura direta (sem cache): usada dentro das transações que ajustam o patrimônio
+    res = conn.execute("SELECT total_patrimony_enc FROM users WHERE username = ?", (username,)).fetchone()
     if res and res[0]:
         dec = protector.decrypt(res[0])
         try:
@@ -609,15 +1074,25 @@ def get_user_patrimony(username: str, protector: DataProtector):
             return 0.0
     return 0.0
 
+@st.cache_data(show_spinner=False, max_entries=64)
+def _get_user_patrimony_cached(username: str, version: int, _protector: DataProtector) -> float:
+    # `version` só participa da chave do cache; `_protector` não é hasheado pelo Streamlit
+    return _read_user_patrimony(get_conn(), username, _protector)
+
+def get_user_patrimony(username: str, protector: DataProtector) -> float:
+    """Patrimônio global decriptado (em cache até a próxima gravação); lido em todo rerun pela sidebar."""
+    return _get_user_patrimony_cached(username, data_version("patrimony", username), protector)
+
 def set_user_patrimony(username: str, total: float, protector: DataProtector):
     enc_val = protector.encrypt(str(float(total)))
-    conn = sqlite3.connect(DB_FILE)
-    conn.execute("UPDATE users SET total_patrimony_enc = ? WHERE username = ?", (enc_val, username))
-    conn.commit()
-    conn.close()
+    with db_transaction() as conn:
+        conn.execute(UPD_PATRIMONY_SQL, (enc_val, username))
+    bump_data_version("patrimony", username)
 
-def sync_global_patrimony(username: str, protector: DataProtector):
-    metas = get_goals(username, protector)
+def sync_global_patrimony(username: str, protector: DataProtector, metas: list[dict] | None = None):
+    """Recalcula o patrimônio global a partir das metas (use `metas` se já estiverem em memória)."""
+    if metas is None:
+        metas = get_goals(username, protector)
     total = sum(float(m.get("atual", 0.0)) for m in metas if m.get("tipo") == "Patrimônio")
     set_user_patrimony(username, total, protector)
     return total
@@ -625,17 +1100,22 @@ def sync_global_patrimony(username: str, protector: DataProtector):
 # ---------------------------
 # AUXILIARES FINANCEIRO (HORA)
 # ---------------------------
+def _net_hours(h1: int, m1: int, h2: int, m2: int, hi: int, mi: int) -> float:
+    """Horas líquidas (saída - entrada - intervalo) só com aritmética inteira; saída < entrada vira o dia."""
+    bruto_min = ((h2 * 60 + m2) - (h1 * 60 + m1)) % (24 * 60)
+    return max(0.0, (bruto_min - (hi * 60 + mi)) / 60.0)
+
+def parse_hhmm(s: str) -> tuple[int, int]:
+    """'HH:MM' -> (hora, minuto) sem strptime: formato fixo, gravado pelo próprio app via strftime."""
+    h, m = s.split(":")
+    h, m = int(h), int(m)
+    if not (0 <= h < 24 and 0 <= m < 60):
+        raise ValueError(f"Horário inválido: {s!r}")
+    return h, m
+
 def calculate_hours(ent_str: str, sai_str: str, int_str: str):
     try:
-        fmt = "%H:%M"
-        t1 = datetime.strptime(ent_str, fmt)
-        t2 = datetime.strptime(sai_str, fmt)
-        tint = datetime.strptime(int_str, fmt)
-        intervalo_decimal = tint.hour + tint.minute / 60.0
-
-        bruto = (t2 - t1).seconds / 3600
-        liquido = max(0.0, bruto - intervalo_decimal)
-        return float(liquido)
+        return _net_hours(*parse_hhmm(ent_str), *parse_hhmm(sai_str), *parse_hhmm(int_str))
     except Exception:
         return 0.0
 
@@ -677,6 +1157,11 @@ def fmt_horas_trabalho(horas: float) -> str:
     h, m = divmod(total_min, 60)
     return f"{h}h {m}min"
 
+def fmt_tempo(horas: float) -> str:
+    """Formato do campo 'tempo' das transações: '3h 12m' (minutos arredondados, sem floats intermediários)"""
+    h, m = divmod(int(round(horas * 60)), 60)
+    return f"{h}h {m}m"
+
 
 def horas_para_dias_trabalho(horas: float, horas_dia: float = 8.0) -> int:
     """Converte horas em dias de trabalho (padrão 8h/dia)"""
@@ -752,14 +1237,19 @@ inject_global_css()
 # Sessão
 if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
-if "editing_item" not in st.session_state:
-    st.session_state.editing_item = None
+if "editing_id" not in st.session_state:
+    st.session_state.editing_id = None
 if "active_goal" not in st.session_state:
     st.session_state.active_goal = None
 
 # ---------------------------
 # LOGIN/REGISTRO
 # ---------------------------
+@st.cache_resource(show_spinner=False)
+def _get_auth_executor() -> ThreadPoolExecutor:
+    # bcrypt (custo 12 ≈ 250ms) roda fora da thread do script; libera o GIL enquanto calcula
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="atlas-auth")
+
 def do_login_screen():
     cols = st.columns([1, 2, 1])
     with cols[1]:
@@ -770,22 +1260,37 @@ def do_login_screen():
             u = st.text_input("Usuário", key="login_u")
             p = st.text_input("Senha", type="password", key="login_p")
             if st.button("Entrar", use_container_width=True, key="btn_login"):
-                conn = sqlite3.connect(DB_FILE)
-                c = conn.cursor()
-                c.execute("SELECT password_hash FROM users WHERE username = ?", (u,))
-                res = c.fetchone()
-                conn.close()
+                res = get_conn().execute(
+                    "SELECT password_hash, salt, kdf_iterations, encrypted_profile, total_patrimony_enc "
+                    "FROM users WHERE username = ?",
+                    (u,),
+                ).fetchone()
+
+                with st.spinner("Autenticando..."):
+                    ok = bool(res) and _get_auth_executor().submit(
+                        bcrypt.checkpw, p.encode("utf-8"), res[0].encode("utf-8")
+                    ).result()
+                    # PBKDF2 só depois da senha conferida; se a conta acabou de ser criada nesta sessão,
+                    # reaproveita o protector do cadastro (mesma conta/salt, senha conferida pelo bcrypt)
+                    protector = None
+                    if ok:
+                        reg = st.session_state.pop("reg_protector", None)
+                        if reg is not None and reg.username == u and reg.salt == res[1]:
+                            protector = reg
+                        else:
+                            protector = DataProtector(u, p, res[1], res[2])
 
-                if res and bcrypt.checkpw(p.encode("utf-8"), res[0].encode("utf-8")):
+                if ok:
                     st.session_state.logged_in = True
                     st.session_state.username = u
-                    st.session_state.protector = DataProtector(p)
+                    st.session_state.protector = protector
 
-                    # garante que o usuário tenha perfil e patrimônio inicial (caso venha de DB antigo/bug)
-                    prof = get_user_profile(u, st.session_state.protector)
-                    save_user_profile(u, prof, st.session_state.protector)
-                    if get_user_patrimony(u, st.session_state.protector) is None:
-                        set_user_patrimony(u, 0.0, st.session_state.protector)
+                    # garante que o usuário tenha perfil e patrimônio inicial (caso venha de DB antigo/bug);
+                    # só grava quando falta (ou não decripta) — login normal não faz nenhuma escrita
+                    if not res[3] or protector.decrypt_json(res[3]) is None:
+                        save_user_profile(u, default_profile(), protector)
+                    if not res[4]:
+                        set_user_patrimony(u, 0.0, protector)
 
                     st.rerun()
                 else:
@@ -793,31 +1298,22 @@ def do_login_screen():
 
         with t_reg:
             nu = st.text_input("Novo Usuário", key="reg_u")
-            np = st.text_input("Nova Senha", type="password", key="reg_p")
+            npw = st.text_input("Nova Senha", type="password", key="reg_p")
             if st.button("Registrar", use_container_width=True, key="btn_reg"):
-                if not nu.strip() or not np:
+                if not nu.strip() or not npw:
                     st.error("Preencha usuário e senha.")
                     return
 
-                p_hash = bcrypt.hashpw(np.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
-                tp = DataProtector(np)
+                with st.spinner("Criando conta..."):
+                    # bcrypt e PBKDF2 são independentes aqui: calcula os dois em paralelo
+                    hash_future = _get_auth_executor().submit(bcrypt.hashpw, npw.encode("utf-8"), bcrypt.gensalt())
+                    user_salt = os.urandom(16)
+                    tp = DataProtector(nu, npw, user_salt, PBKDF2_ITERATIONS)
+                    p_hash = hash_future.result().decode("utf-8")
 
                 prof = default_profile()
-                enc_prof = tp.encrypt(json.dumps(prof))
-                enc_zero = tp.encrypt("0.0")
-
-                conn = sqlite3.connect(DB_FILE)
-                try:
-                    conn.execute(
-                        "INSERT INTO users (username, password_hash, encrypted_profile, total_patrimony_enc) VALUES (?, ?, ?, ?)",
-                        (nu, p_hash, enc_prof, enc_zero),
-                    )
-                    conn.commit()
-                    st.success("Conta criada! Agora faça login.")
-                except Exception:
-                    st.error("Usuário já existe ou erro no registro.")
-                finally:
-                    conn.close()
+                enc_prof = tp.encrypt_json(prof)
+                enc_zero = tp.encrypt("0.0")  # patrimônio inicial: a meta padrão começa zerada
 
                 # ============================
                 # CRIA META PADRÃO DE PATRIMÔNIO
@@ -832,7 +1328,300 @@ def do_login_screen():
                     "is_default": True
                 }
 
-                save_goal(nu, default_goal, tp)
+                # usuário + meta padrão na mesma transação (um único commit; se o usuário já existir,
+                # nada é gravado — nem a meta padrão)
+                try:
+                    with db_transaction() as conn:
+                        conn.execute(
+                            "INSERT INTO users (username, password_hash, encrypted_profile, total_patrimony_enc, salt, kdf_iterations) "
+                            "VALUES (?, ?, ?, ?, ?, ?)",
+                            (nu, p_hash, enc_prof, enc_zero, user_salt, PBKDF2_ITERATIONS),
+                        )
+                        conn.execute(INS_GOAL_SQL, (default_goal["id"], nu, tp.encrypt_json(default_goal)))
+                    bump_data_version("goals", nu)
+                    # só nesta sessão: o login logo em seguida não precisa derivar a chave de novo
+                    st.session_state.reg_protector = tp
+                    st.success("Conta criada! Agora faça login.")
+                except Exception:
+                    st.error("Usuário já existe ou erro no registro.")
+
+# ---------------------------
+# METAS (PAINEL)
+# ---------------------------
+def _set_active_goal(goal_id: str | None):
+    st.session_state.active_goal = goal_id
+
+def _set_page(page_key: str, page: int):
+    st.session_state[page_key] = page
+
+def _rerun_goals(full_app: bool = False):
+    """
+    Rerun depois de gravar no painel de metas: só o fragment quando a sidebar (patrimônio) não
+    muda; o app inteiro quando muda ou quando o trecho rodou num rerun completo (lá o Streamlit
+    recusa o scope="fragment" com StreamlitAPIException).
+    """
+    if full_app:
+        st.rerun()
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+@st.fragment
+def render_goals_section(username: str, protector: DataProtector):
+    """
+    Lista de metas + painel da meta ativa, como fragment: interações aqui (abrir painel, trocar
+    operação, digitar valores) re-executam só este trecho, sem sidebar/perfil. Gravações que mudam
+    o patrimônio chamam st.rerun() (app inteiro) para a sidebar refletir a mudança; as demais
+    re-executam só o fragment.
+    """
+    metas = get_goals(username, protector)
+    if not metas:
+        st.info("Você ainda não criou metas.")
+        return
+    metas_by_id = {m["id"]: m for m in metas}
+
+    st.subheader("📌 Suas metas")
+    for m in metas:
+        with st.container(border=True):
+            col1, col2, col3 = st.columns([3, 2, 1])
+            prog = min(float(m.get("atual", 0.0)) / max(float(m.get("objetivo", 0.1)), 0.1), 1.0)
+            col1.markdown(f"### {m.get('nome','(sem nome)')} ({m.get('tipo','-')})")
+            col2.metric("Saldo", f"R$ {float(m.get('atual',0.0)):,.2f}", f"{prog*100:.1f}%")
+            col2.progress(prog)
+            # callback: o estado muda antes do rerun do fragment, sem st.rerun() extra
+            col3.button("Gerenciar", key=f"btn_{m['id']}", on_click=_set_active_goal, args=(m["id"],))
+
+    if st.session_state.active_goal:
+        goal = metas_by_id.get(st.session_state.active_goal)
+        if not goal:
+            st.session_state.active_goal = None
+            return
+
+        st.divider()
+        st.header(f"Configurações: {goal['nome']}")
+
+        tab_mov, tab_edit, tab_hist = st.tabs(["💸 Movimentar", "⚙️ Editar Meta", "📜 Histórico"])
+
+        with tab_mov:
+            c_in, c_viz = st.columns([1, 2])
+
+            with c_in:
+                st.subheader("Movimentação")
+
+                help_toggle_button(
+                    key=f"meta_mov_{goal['id']}",
+                    title="Como funcionam Aporte, Retirada e Balanço?",
+                    content_md=(
+                        "**Aporte**: adiciona dinheiro na meta.\n\n"
+                        "**Retirada**: remove dinheiro da meta (não deixa ficar negativo).\n\n"
+                        "**Balanço (correção)**: você informa o **saldo real atual** da meta.\n"
+                        "O sistema calcula a diferença:\n"
+                        "- Se o saldo real for maior → registra **Aporte** da diferença.\n"
+                        "- Se o saldo real for menor → registra **Retirada** da diferença.\n"
+                        "Assim você corrige sem fazer contas."
+                    ),
+                )
+
+                # ✅ Tipo agora tem Balanço inteligente
+                tipo = st.selectbox("Operação", ["Aporte", "Retirada", "Balanço (correção)"], key=f"t_mov_{goal['id']}")
+
+                # ✅ Data/Hora (para TODOS: aporte/retirada/balanço)
+                now = datetime.now()
+                cdt1, cdt2 = st.columns([2, 1])
+                g_date = cdt1.date_input("Data da operação", value=now.date(), key=f"g_date_{goal['id']}")
+                g_time = cdt2.time_input("Hora", value=now.time().replace(second=0, microsecond=0), key=f"g_time_{goal['id']}")
+                g_dt = datetime.combine(g_date, g_time)
+
+                desc = st.text_area("Descrição/Origem", key=f"d_mov_{goal['id']}")
+
+                # Campos variam conforme tipo
+                if tipo == "Balanço (correção)":
+                    saldo_atual_sistema = float(goal.get("atual", 0.0))
+                    st.caption(f"Saldo calculado da meta agora: **{_brl(saldo_atual_sistema)}**")
+
+                    saldo_informado = st.number_input(
+                        "Qual é o saldo real atual dessa meta (R$)?",
+                        min_value=0.0,
+                        step=10.0,
+                        key=f"saldo_real_{goal['id']}",
+                    )
+
+                    if st.button("Aplicar Balanço", key=f"btn_bal_{goal['id']}"):
+                        delta = float(saldo_informado) - float(saldo_atual_sistema)
+
+                        if abs(delta) < 0.005:
+                            st.info("✅ O saldo informado já bate com o saldo atual da meta. Nenhuma correção necessária.")
+                            st.stop()
+
+                        # delta > 0 => aporte; delta < 0 => retirada
+                        op = "Aporte" if delta > 0 else "Retirada"
+                        v = abs(delta)
+
+                        # retirada não pode deixar negativo
+                        if op == "Retirada" and v > float(goal.get("atual", 0.0)):
+                            st.error(
+                                f"Operação negada! A correção deixaria saldo negativo. "
+                                f"(Atual: {_brl(float(goal.get('atual',0.0)))})"
+                            )
+                            st.stop()
+
+                        insert_history_entry(
+                            goal,
+                            {
+                                "uid": secrets.token_hex(8),
+                                "data": g_dt.isoformat(),          # ✅ data/hora escolhida
+                                "tipo": op,                         # ✅ registra como Aporte/Retirada
+                                "valor": float(v),
+                                "descricao": (desc or "Balanço (correção)"),
+                            }
+                        )
+                        goal, _ = rebuild_goal_state(goal, resort=False)
+                        patrimonio_mudou = save_goal(username, goal, protector)
+                        st.success(f"Balanço aplicado! Registrado como **{op}** de **{_brl(v)}**.")
+                        _rerun_goals(full_app=patrimonio_mudou)
+
+                else:
+                    # Aporte / Retirada (normal)
+                    valor = st.number_input("Valor R$", min_value=0.0, step=10.0, key=f"v_mov_{goal['id']}")
+
+                    if st.button("Registrar", key=f"btn_reg_mov_{goal['id']}"):
+                        if float(valor) <= 0:
+                            st.error("O valor precisa ser maior que zero.")
+                            st.stop()
+
+                        if tipo == "Retirada" and float(valor) > float(goal.get("atual", 0.0)):
+                            st.error(
+                                f"Operação negada! Saldo insuficiente "
+                                f"(Atual: {_brl(float(goal.get('atual',0.0)))})"
+                            )
+                            st.stop()
+
+                        insert_history_entry(
+                            goal,
+                            {
+                                "uid": secrets.token_hex(8),
+                                "data": g_dt.isoformat(),          # ✅ data/hora escolhida
+                                "tipo": tipo,                       # "Aporte" ou "Retirada"
+                                "valor": float(valor),
+                                "descricao": desc,
+                            }
+                        )
+                        goal, _ = rebuild_goal_state(goal, resort=False)
+                        patrimonio_mudou = save_goal(username, goal, protector)
+                        st.success("Registrado!")
+                        _rerun_goals(full_app=patrimonio_mudou)
+
+            with c_viz:
+                if goal.get("historico"):
+                    import plotly.express as px
+
+                    dias, saldos = goal_daily_balance(username, goal)
+                    fig = px.line(
+                        x=dias,
+                        y=saldos,
+                        markers=True,
+                        labels={"x": "data_dt", "y": "valor_acumulado"},
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
+                else:
+                    st.info("Sem histórico ainda.")
+
+        with tab_edit:
+            st.subheader("Ajustes da Meta")
+            new_n = st.text_input("Renomear Meta", value=goal.get("nome", ""), key="edit_nome")
+            new_o = st.number_input("Alterar Objetivo", value=float(goal.get("objetivo", 0.0)), step=50.0, key="edit_obj")
+
+            if float(goal.get("atual", 0.0)) >= float(goal.get("objetivo", 0.0)) and float(goal.get("objetivo", 0.0)) > 0:
+                st.success("🎯 Objetivo Atingido! Deseja expandir?")
+                c1, c2 = st.columns(2)
+                if c1.button("Dobrar Meta (2x)", key="btn_dobrar"):
+                    goal["objetivo"] = float(goal["objetivo"]) * 2
+                    _rerun_goals(full_app=save_goal(username, goal, protector))
+                if c2.button("Aumentar 50% (1.5x)", key="btn_50"):
+                    goal["objetivo"] = float(goal["objetivo"]) * 1.5
+                    _rerun_goals(full_app=save_goal(username, goal, protector))
+
+            if st.button("Salvar Alterações", key="btn_salvar_meta"):
+                goal["nome"] = new_n
+                goal["objetivo"] = float(new_o)
+                patrimonio_mudou = save_goal(username, goal, protector)
+                st.toast("Meta atualizada.")
+                _rerun_goals(full_app=patrimonio_mudou)
+
+            if goal.get("is_default"):
+                st.warning("🚫 Esta é a meta padrão do sistema e não pode ser excluída.")
+            else:
+                if st.button("Excluir Meta", type="primary", key="btn_excluir_meta"):
+                    delete_goal(username, goal["id"], protector)
+                    st.session_state.active_goal = None
+                    st.toast("Meta excluída.")
+                    st.rerun()
+
+        with tab_hist:
+            st.subheader("Gerenciar Registros")
+            if goal.get("historico"):
+                st.caption("Edite, inclua ou exclua registros na tabela e clique em **Salvar Alterações**.")
+                original = history_editor_df(goal)
+                # uma única grade (virtualizada) no lugar de um expander com 4 widgets por registro;
+                # a versão no key descarta as edições pendentes depois de cada gravação
+                edited = st.data_editor(
+                    original,
+                    key=f"hist_ed_{goal['id']}_{data_version('goals', username)}",
+                    num_rows="dynamic",
+                    hide_index=True,
+                    column_order=["data", "tipo", "valor", "descricao", "valor_acumulado"],
+                    column_config={
+                        "data": st.column_config.DatetimeColumn("Data", format="DD/MM/YYYY HH:mm", required=True),
+                        "tipo": st.column_config.SelectboxColumn("Tipo", options=list(HISTORY_TIPOS), required=True),
+                        "valor": st.column_config.NumberColumn("Valor (R$)", min_value=0.0, format="%.2f", required=True),
+                        "descricao": st.column_config.TextColumn("Descrição"),
+                        "valor_acumulado": st.column_config.NumberColumn("Acumulado (R$)", format="%.2f"),
+                    },
+                    disabled=["valor_acumulado"],
+                )
+
+                if st.button("Salvar Alterações", key=f"btn_hist_save_{goal['id']}"):
+                    novo_hist = apply_history_edits(goal, original, edited)
+                    if novo_hist is None:
+                        st.toast("Sem alterações.")
+                    else:
+                        goal["historico"] = novo_hist
+                        goal, ficou_negativo = rebuild_goal_state(goal)
+
+                        # Checa saldo negativo em algum ponto (calculado no mesmo passe do acumulado)
+                        if ficou_negativo:
+                            st.error("Erro: essas alterações deixariam o saldo negativo em algum ponto do histórico!")
+                        else:
+                            patrimonio_mudou = save_goal(username, goal, protector)
+                            st.toast("Registros atualizados.")
+                            _rerun_goals(full_app=patrimonio_mudou)
+            else:
+                st.info("Sem registros.")
+
+        st.button("Fechar Painel", key="btn_fechar_painel", on_click=_set_active_goal, args=(None,))
+
+
+# ---------------------------
+# TRANSAÇÕES (LISTAGEM)
+# ---------------------------
+def _tx_row_action(action: str, username: str):
+    """
+    Callback único dos botões ✏️/🗑️ da barra de ações (agem sobre a transação escolhida em
+    "tx_sel"): roda antes do rerun do clique, então não precisa de um st.rerun() extra.
+    Na edição só o id vai para o session_state; o Novo Lançamento relê a transação pelo id.
+    """
+    item_id = st.session_state.get("tx_sel")
+    if not item_id:
+        return
+    if action == "edit":
+        st.session_state.editing_id = item_id
+        st.session_state.tx_tab = "Novo Lançamento"
+    elif action == "delete":
+        delete_financial_item(username, item_id)
+        st.session_state.tx_last_result = {"ok": True, "msg": "Transação excluída com sucesso! 🗑️"}
+        st.session_state.tx_tab = "Registros"
+
 
 # --------------------------
 # TELA PRINCIPAL
@@ -910,11 +1699,14 @@ def do_main_app():
                 "Meu Perfil",
             ],
             key="menu_radio",
+            on_change=_set_page,
+            args=("tx_page", 0),  # sair/voltar aos Registros recomeça da primeira página
         )
 
         if st.button("Sair"):
             st.session_state.logged_in = False
-            st.session_state.editing_item = None
+            st.session_state.protector = None
+            st.session_state.editing_id = None
             st.session_state.active_goal = None
             st.rerun()
 
@@ -923,25 +1715,25 @@ def do_main_app():
     # ---------------------------
     if menu == "Visão Geral":
         st.title("📊 Dashboard Atlas (Financeiro)")
-        items = get_financial_items(username, protector)
+        df = get_financial_df(username, protector)
 
-        if items:
-            df = pd.DataFrame(items)
-            df["valor"] = df["valor"].astype(float)
+        if not df.empty:
 
             # ============================
             # SELETOR DE TEMPO (Visão Geral)
             # ============================
-            df["data_fmt"] = parse_tx_datetime(df["data"])
-            df = df.dropna(subset=["data_fmt"]).copy()
+            df = df.iloc[: df["data_fmt"].count()]  # NaT ficam no fim (df ordenado por data)
+            if df.empty:
+                st.info("Sem transações no período selecionado.")
+                return
 
             # Estado do filtro (mantém escolha ao navegar)
             if "vg_time_mode" not in st.session_state:
                 st.session_state.vg_time_mode = "Mensal"
             if "vg_custom_start" not in st.session_state:
-                st.session_state.vg_custom_start = df["data_fmt"].min().date()
+                st.session_state.vg_custom_start = df["data_fmt"].iloc[0].date()
             if "vg_custom_end" not in st.session_state:
-                st.session_state.vg_custom_end = df["data_fmt"].max().date()
+                st.session_state.vg_custom_end = df["data_fmt"].iloc[-1].date()
 
             with st.container(border=True):
                 st.subheader("🗓️ Período de exibição")
@@ -957,9 +1749,7 @@ def do_main_app():
                     )
 
                 # Intervalo (range) usado para filtrar tudo na página
-                df["data_fmt"] = parse_tx_datetime(df["data"])
-                df = df.dropna(subset=["data_fmt"]).copy()
-
+                # (data_fmt já foi parseado e limpo de NaT logo após montar o df)
                 min_d = df["data_fmt"].min().date()
                 max_d_data = df["data_fmt"].max().date()
 
@@ -999,12 +1789,11 @@ def do_main_app():
                     st.session_state.vg_custom_start = start_d
                     st.session_state.vg_custom_end = end_d
 
-                    start_ts = pd.to_datetime(start_d)
-                    end_ts = pd.to_datetime(end_d) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+                    start_ts, end_ts = date_range_bounds(start_d, end_d)
 
                 else:
                     # “Janelas prontas” (você pode ajustar depois)
-                    now = df["data_fmt"].max()
+                    now = df["data_fmt"].iloc[-1]
                     if time_mode == "Diário":
                         start_ts = now.normalize()  # hoje
                     elif time_mode == "Semanal":
@@ -1015,34 +1804,28 @@ def do_main_app():
                         start_ts = (now - pd.Timedelta(days=365)).normalize()  # últimos 12 meses
                     end_ts = now
 
-            # Filtra tudo da página
-            df_vg = df[(df["data_fmt"] >= start_ts) & (df["data_fmt"] <= end_ts)].copy()
-
-            # Se ficar vazio, avisa e não quebra gráficos
-            if df_vg.empty:
-                st.info("Sem transações no período selecionado.")
-                return
-
             # ============================
-            # Normaliza impacto (delta) NO DATAFRAME TODO
-            # (pra conseguir saldo base antes do período)
+            # Impacto no saldo NO DATAFRAME TODO (pra conseguir saldo base antes do período):
+            # a coluna `signed` já vem pronta do cache (+Entrada / -Saída / 0 p/ outros), a mesma
+            # convenção do saldo atual (compute_current_balance)
             # ============================
-            df["delta"] = pd.to_numeric(df["valor"], errors="coerce").fillna(0.0)
-            df.loc[df["tipo"] == "Saída", "delta"] = -df.loc[df["tipo"] == "Saída", "delta"].abs()
-            df.loc[df["tipo"] == "Entrada", "delta"] = df.loc[df["tipo"] == "Entrada", "delta"].abs()
+            # df está em ordem cronológica: o período é uma fatia contígua (busca binária, sem máscaras)
+            delta_np = df["signed"].to_numpy()
+            in_period = period_slice(df["data_fmt"], start_ts, end_ts)
 
-            # Filtra tudo da página (agora mantendo delta)
-            df_vg = df[(df["data_fmt"] >= start_ts) & (df["data_fmt"] <= end_ts)].copy()
+            # Filtra tudo da página — fatia única, reaproveitada pelos gráficos
+            df_vg = df.iloc[in_period]
 
+            # Se ficar vazio, avisa e não quebra gráficos
             if df_vg.empty:
                 st.info("Sem transações no período selecionado.")
                 return
 
             # ✅ saldo acumulado antes do período (base)
-            saldo_base = float(df[df["data_fmt"] < start_ts]["delta"].sum())
+            saldo_base = float(delta_np[: in_period.start].sum())
 
             # ✅ saldo no fim do período (o “saldo atualizado”)
-            saldo_no_fim = saldo_base + float(df_vg["delta"].sum())
+            saldo_no_fim = saldo_base + float(delta_np[in_period].sum())
 
             # # Mapeia granularidade -> frequência pandas
             # freq_map = {
@@ -1054,8 +1837,7 @@ def do_main_app():
             # }
             # freq = freq_map.get(time_mode, "M")
 
-            ent_total = float(df_vg[df_vg["tipo"] == "Entrada"]["valor"].sum())
-            sai_total = float(df_vg[df_vg["tipo"] == "Saída"]["valor"].sum())
+            ent_total, sai_total = sum_entradas_saidas(df_vg["tipo"], df_vg["valor"])
 
             balanco_periodo = ent_total - sai_total  # (balanço só do período)
             balanco_atual = float(saldo_no_fim)      # (saldo real acumulado até o fim do período)
@@ -1084,10 +1866,26 @@ def do_main_app():
 
             st.divider()
 
+            import plotly.graph_objects as go
+
             g1, g2 = st.columns(2)
-            df_sai = df_vg[df_vg["tipo"] == "Saída"]
-            if not df_sai.empty:
-                fig_cat = px.pie(df_sai, values="valor", names="categoria", title="Distribuição de Gastos", hole=.4)
+            # soma por categoria aqui (uma fatia por categoria, na ordem em que aparecem) em vez de
+            # mandar todas as saídas pro px.pie agrupar; go.Pie evita o despacho do Plotly Express
+            gastos = (
+                df_vg.loc[df_vg["tipo"] == "Saída"]
+                    .groupby("categoria", observed=True, sort=False)["valor"]
+                    .sum()
+            )
+            if not gastos.empty:
+                fig_cat = go.Figure(
+                    go.Pie(
+                        labels=gastos.index.astype(str),
+                        values=gastos.to_numpy(),
+                        hole=.4,
+                        hovertemplate="categoria=%{label}<br>valor=%{value}<extra></extra>",
+                    )
+                )
+                fig_cat.update_layout(title="Distribuição de Gastos", legend_tracegroupgap=0)
                 g1.plotly_chart(fig_cat, use_container_width=True)
             else:
                 g1.info("Sem dados de saída para exibir gráfico.")
@@ -1096,9 +1894,6 @@ def do_main_app():
             # GRÁFICO DE LINHA (sem inventar dados)
             # - só cria ponto quando existe transação
             # ==========================================
-            df_vg = df[(df["data_fmt"] >= start_ts) & (df["data_fmt"] <= end_ts)].copy()
-            df_vg = df_vg.sort_values("data_fmt").copy()
-
             # ✅ granularidade para linha:
             # - Anual: agrupa por mês (só meses com movimento)
             # - resto: agrupa por dia (só dias com movimento)
@@ -1109,18 +1904,19 @@ def do_main_app():
 
             # Bucket do período SEM criar vazios
             if line_freq == "D":
-                df_vg["periodo"] = df_vg["data_fmt"].dt.floor("D")
+                periodo = df_vg["data_fmt"].dt.floor("D")
             else:  # "M"
-                df_vg["periodo"] = df_vg["data_fmt"].dt.to_period("M").dt.start_time
-
-            df_period = (
-                df_vg.groupby("periodo", as_index=False)["delta"]
-                    .sum()
-                    .rename(columns={"delta": "delta_periodo"})
-            )
-
-            df_period = df_period.sort_values("periodo").reset_index(drop=True)
-            df_period["patrimonio"] = saldo_base + df_period["delta_periodo"].cumsum()
+                periodo = df_vg["data_fmt"].dt.to_period("M").dt.start_time
+
+            # df_vg está ordenado por data e o bucket é um "floor" dela: cada período é um bloco
+            # contíguo, então np.unique (início de cada bloco) + np.add.reduceat somam sem groupby
+            periodos, starts = np.unique(periodo.to_numpy(), return_index=True)
+            delta_periodo = np.add.reduceat(delta_np[in_period], starts)
+            df_period = pd.DataFrame({
+                "periodo": periodos,
+                "delta_periodo": delta_periodo,
+                "patrimonio": saldo_base + delta_periodo.cumsum(),
+            })
 
             fig_evol = go.Figure()
             fig_evol.add_trace(
@@ -1193,6 +1989,8 @@ def do_main_app():
             tabs,
             horizontal=True,
             key="tx_tab_radio",
+            on_change=_set_page,
+            args=("tx_page", 0),
         )
 
         if st.session_state.tx_tab == "Ajuste de Balanço":
@@ -1217,7 +2015,7 @@ def do_main_app():
             # saldo calculado (antes do ajuste)
             saldo_calculado = compute_current_balance(username, protector)
 
-            st.caption(f"Saldo calculado pelo sistema agora: **R$ {saldo_calculado:,.2f}**".replace(",", "X").replace(".", ",").replace("X", "."))
+            st.caption(f"Saldo calculado pelo sistema agora: **{_brl(saldo_calculado)}**")
 
             with st.form("balanco_form"):
                 saldo_informado = st.number_input(
@@ -1240,13 +2038,13 @@ def do_main_app():
                     if abs(delta) < 0.005:
                         st.info("✅ Seu saldo informado já bate com o saldo calculado. Nenhum ajuste foi necessário.")
                     else:
-                        tid = str(datetime.now().timestamp())
+                        tid = secrets.token_hex(8)
                         t_aj = "Entrada" if delta > 0 else "Saída"
                         valor_ajuste = abs(delta)
 
                         # tempo só faz sentido para Saída
                         total_h = (valor_ajuste / valor_hora) if (valor_hora > 0 and t_aj == "Saída") else 0
-                        tempo = f"{int(total_h)}h {int((total_h-int(total_h))*60)}m" if t_aj == "Saída" else "-"
+                        tempo = fmt_tempo(total_h) if t_aj == "Saída" else "-"
 
                         item = {
                             "id": tid,
@@ -1261,14 +2059,18 @@ def do_main_app():
 
                         st.toast("Balanço aplicado! ⚖️", icon="⚖️")
                         st.success(
-                            f"Ajuste registrado como **{t_aj}** de **R$ {valor_ajuste:,.2f}** para igualar ao saldo informado."
-                            .replace(",", "X").replace(".", ",").replace("X", ".")
+                            f"Ajuste registrado como **{t_aj}** de **{_brl(valor_ajuste)}** para igualar ao saldo informado."
                         )
                         st.rerun()
 
         elif st.session_state.tx_tab == "Novo Lançamento":
-            edit_mode = st.session_state.editing_item is not None
-            current_edit = st.session_state.editing_item
+            # transação em edição relida pelo id (se tiver sido excluída nesse meio-tempo, volta ao modo "novo")
+            current_edit = None
+            if st.session_state.editing_id is not None:
+                current_edit = get_financial_item(username, st.session_state.editing_id, protector)
+                if current_edit is None:
+                    st.session_state.editing_id = None
+            edit_mode = current_edit is not None
 
             if edit_mode:
                 st.subheader(f"✏️ Editando: {current_edit.get('descricao') or current_edit.get('categoria')}")
@@ -1318,44 +2120,10 @@ def do_main_app():
             tt = c1.selectbox("Tipo", ["Entrada", "Saída"], index=tt_default, key="tx_tipo")
 
             # categorias disponíveis (as mesmas do sistema)
-            cat_list = [
-                # Entradas
-                "Salário",
-                "Extra",
-
-                # Essenciais
-                "Moradia",
-                "Alimentação",
-                "Transporte",
-                "Saúde",
-                "Educação",
-
-                # Financeiro
-                "Contas",
-                "Cartão de Crédito",
-                "Impostos",
-                "Taxas e Tarifas",
-
-                # Pessoal
-                "Lazer",
-                "Cuidados Pessoais",
-                "Assinaturas",
-                "Presentes / Doações",
-
-                # Metas / Patrimônio
-                "Meta",
-                "Reserva de Emergência",
-                "Poupança",
-                "Investimentos",
-
-                # Outros
-                "Outros",
-            ]
-
-            if edit_mode and current_edit.get("categoria") in cat_list:
-                cat_idx = cat_list.index(current_edit.get("categoria"))
-            else:
-                cat_idx = 4  # Contas
+            cat_list = CATEGORY_LIST
+
+            # categoria da transação em edição (lookup O(1)); padrão: índice 4 (Transporte)
+            cat_idx = CATEGORY_INDEX.get(current_edit.get("categoria"), 4) if edit_mode and current_edit else 4
 
             cat = c2.selectbox("Categoria", cat_list, index=cat_idx, key="tx_cat")
             val = c3.number_input("Valor R$", min_value=0.0, value=val_default, step=10.0, key="tx_val")
@@ -1370,21 +2138,11 @@ def do_main_app():
             # ============================
             # PRÉVIA: SALDO ATUAL + IMPACTO + SALDO PROJETADO (SEM HTML)
             # ============================
-            all_items = get_financial_items(username, protector)
-            saldo_atual = 0.0
-
-            if all_items:
-                df_tmp = pd.DataFrame(all_items)
-                if not df_tmp.empty:
-                    df_tmp["valor"] = pd.to_numeric(df_tmp["valor"], errors="coerce").fillna(0.0)
-
-                    # se estiver editando, remove a transação antiga do cálculo pra não duplicar
-                    if edit_mode and current_edit and current_edit.get("id") in df_tmp.get("id", []).tolist():
-                        df_tmp = df_tmp[df_tmp["id"] != current_edit.get("id")]
-
-                    entradas = df_tmp[df_tmp["tipo"] == "Entrada"]["valor"].sum()
-                    saidas = df_tmp[df_tmp["tipo"] == "Saída"]["valor"].sum()
-                    saldo_atual = float(entradas - saidas)
+            # não depende do valor digitado: em cache por versão dos dados (digitar não reconstrói o DataFrame);
+            # se estiver editando, a transação antiga fica fora do cálculo pra não duplicar
+            saldo_atual = compute_current_balance(
+                username, protector, exclude_id=current_edit.get("id") if edit_mode and current_edit else None
+            )
 
             delta_prev = float(val) if tt == "Entrada" else -float(val)
             saldo_projetado = saldo_atual + delta_prev
@@ -1392,7 +2150,7 @@ def do_main_app():
             tempo_prev = "-"
             if tt == "Saída" and valor_hora > 0 and val > 0:
                 total_h_prev = val / valor_hora
-                tempo_prev = f"{int(total_h_prev)}h {int((total_h_prev - int(total_h_prev)) * 60)}m"
+                tempo_prev = fmt_tempo(total_h_prev)
 
             with st.container(border=True):
                 st.markdown("### Impacto no saldo")
@@ -1423,10 +2181,10 @@ def do_main_app():
                     if float(val) <= 0:
                         raise ValueError("O valor precisa ser maior que zero.")
 
-                    tid = current_edit["id"] if edit_mode else str(datetime.now().timestamp())
+                    tid = current_edit["id"] if edit_mode else secrets.token_hex(8)
 
                     total_h = (val / valor_hora) if (valor_hora > 0 and tt == "Saída") else 0
-                    tempo = f"{int(total_h)}h {int((total_h-int(total_h))*60)}m" if tt == "Saída" else "-"
+                    tempo = fmt_tempo(total_h) if tt == "Saída" else "-"
 
                     item = {
                         "id": tid,
@@ -1440,7 +2198,7 @@ def do_main_app():
 
                     save_financial_item(username, item, protector)
 
-                    st.session_state.editing_item = None
+                    st.session_state.editing_id = None
                     st.session_state.tx_last_result = {
                         "ok": True,
                         "msg": "Transação atualizada com sucesso! ✨" if edit_mode else "Transação registrada com sucesso! ✅",
@@ -1454,25 +2212,22 @@ def do_main_app():
 
             if edit_mode:
                 if b2.button("Cancelar Edição", use_container_width=True, key="tx_cancel_btn"):
-                    st.session_state.editing_item = None
+                    st.session_state.editing_id = None
                     st.rerun()
 
 
         else:  # "Registros"
-            items = get_financial_items(username, protector)
-
             # ----------------------------
             # FILTROS (consulta)
             # ----------------------------
             st.subheader("🔎 Consulta")
             f1, f2, f3 = st.columns([2, 2, 3])
 
-            df_all = pd.DataFrame(items) if items else pd.DataFrame()
+            df_all = get_financial_df(username, protector)
 
             if not df_all.empty:
-                # ✅ parse robusto
-                df_all["data_fmt"] = parse_tx_datetime(df_all["data"])
-                df_all = df_all.dropna(subset=["data_fmt"]).copy()
+                # ✅ parse robusto (feito uma vez no DataFrame em cache); aqui só descarta datas inválidas
+                df_all = df_all.iloc[: df_all["data_fmt"].count()]  # NaT ficam no fim (df ordenado por data)
 
                 if df_all.empty:
                     df = pd.DataFrame()
@@ -1484,8 +2239,8 @@ def do_main_app():
                     max_d_ui = datetime.now().date()
                     min_d = datetime.now().date()
                 else:
-                    min_d = df_all["data_fmt"].min().date()
-                    max_d_data = df_all["data_fmt"].max().date()
+                    min_d = df_all["data_fmt"].iloc[0].date()
+                    max_d_data = df_all["data_fmt"].iloc[-1].date()
 
                     today = datetime.now().date()
                     max_d_ui = max(max_d_data, today)
@@ -1497,28 +2252,37 @@ def do_main_app():
                     cur_end = clamp_date(cur_end, min_d, max_d_ui)
                     cur_start, cur_end = normalize_start_end(cur_start, cur_end)
 
+                    # filtro novo: a listagem volta à primeira página
+                    reset_limit = {"on_change": _set_page, "args": ("tx_page", 0)}
                     with f1:
-                        start_d = st.date_input("Início", value=cur_start, min_value=min_d, max_value=max_d_ui, key="tx_filter_start")
+                        start_d = st.date_input(
+                            "Início", value=cur_start, min_value=min_d, max_value=max_d_ui, key="tx_filter_start", **reset_limit
+                        )
                     with f2:
-                        end_d = st.date_input("Fim", value=cur_end, min_value=min_d, max_value=max_d_ui, key="tx_filter_end")
+                        end_d = st.date_input(
+                            "Fim", value=cur_end, min_value=min_d, max_value=max_d_ui, key="tx_filter_end", **reset_limit
+                        )
                     with f3:
-                        q = st.text_input("Palavra-chave (descrição/categoria/tipo)", key="tx_filter_q").strip().lower()
+                        q = st.text_input(
+                            "Palavra-chave (descrição/categoria/tipo)", key="tx_filter_q", **reset_limit
+                        ).strip().lower()
 
                     start_d, end_d = normalize_start_end(start_d, end_d)
 
-                    start_ts = pd.to_datetime(start_d)
-                    end_ts = pd.to_datetime(end_d) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+                    start_ts, end_ts = date_range_bounds(start_d, end_d)
 
-                    df = df_all[(df_all["data_fmt"] >= start_ts) & (df_all["data_fmt"] <= end_ts)].copy()
+                    df = df_all.iloc[period_slice(df_all["data_fmt"], start_ts, end_ts)]
 
                     if q:
-                        def _match(row):
-                            fields = [str(row.get("descricao", "")), str(row.get("categoria", "")), str(row.get("tipo", ""))]
-                            return any(q in f.lower() for f in fields)
-
-                        df = df[df.apply(_match, axis=1)]
+                        # busca vetorizada (substring literal, sem regex) nas três colunas de texto
+                        mask = np.zeros(len(df), dtype=bool)
+                        for col in ("descricao", "categoria", "tipo"):
+                            if col in df.columns:
+                                mask |= contains_ci(df[col], q)
+                        df = df[mask]
 
-                    df = df.sort_values(by="data_fmt", ascending=False).reset_index(drop=True)
+                    # mais recente primeiro: df_all já está em ordem cronológica, basta inverter
+                    df = df.iloc[::-1].reset_index(drop=True)
 
                     period_label = f"{start_d.strftime('%d/%m/%Y')} → {end_d.strftime('%d/%m/%Y')}"
                     keyword_label = (q if q else "(vazio)")
@@ -1549,20 +2313,12 @@ def do_main_app():
                 if df is None or df.empty:
                     st.info("Aplique filtros e/ou adicione transações para habilitar exportação.")
                 else:
-                    # DataFrame para exportar (remove colunas internas)
-                    df_export = df.copy()
-                    if "data_fmt" in df_export.columns:
-                        df_export = df_export.drop(columns=["data_fmt"], errors="ignore")
-
-                    # ordena e seleciona colunas mais úteis
-                    cols_pref = ["data", "tipo", "categoria", "descricao", "valor", "tempo", "id"]
-                    cols_final = [c for c in cols_pref if c in df_export.columns] + [c for c in df_export.columns if c not in cols_pref]
-                    df_export = df_export[cols_final]
+                    with st.spinner("Gerando arquivos..."):
+                        csv_bytes, xlsx_bytes, pdf_bytes = build_export_files(
+                            username, data_version("financial", username), start_d, end_d, q, df
+                        )
 
                     c1, c2, c3 = st.columns(3)
-
-                    # CSV
-                    csv_bytes = df_export.to_csv(index=False).encode("utf-8")
                     with c1:
                         st.download_button(
                             "📄 Baixar CSV",
@@ -1571,34 +2327,14 @@ def do_main_app():
                             mime="text/csv",
                             use_container_width=True,
                         )
-
-                    # Excel
-                    xlsx_buf = BytesIO()
-                    with pd.ExcelWriter(xlsx_buf, engine="openpyxl") as writer:
-                        df_export.to_excel(writer, index=False, sheet_name="Transacoes")
-                        # uma aba extra com filtros
-                        pd.DataFrame(
-                            {
-                                "Filtro": ["Período", "Palavra-chave"],
-                                "Valor": [period_label, keyword_label],
-                            }
-                        ).to_excel(writer, index=False, sheet_name="Filtros")
                     with c2:
                         st.download_button(
                             "📊 Baixar Excel",
-                            data=xlsx_buf.getvalue(),
+                            data=xlsx_bytes,
                             file_name=f"transacoes_{username}.xlsx",
                             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                             use_container_width=True,
                         )
-
-                    # PDF (estilizado)
-                    pdf_bytes = build_transactions_pdf(
-                        df=df_export,
-                        username=username,
-                        period_label=period_label,
-                        keyword_label=keyword_label,
-                    )
                     with c3:
                         st.download_button(
                             "🧾 Baixar PDF",
@@ -1608,7 +2344,7 @@ def do_main_app():
                             use_container_width=True,
                         )
 
-                    st.caption(f"Exportando {len(df_export)} linha(s) | Período: {period_label} | Palavra-chave: {keyword_label}")
+                    st.caption(f"Exportando {len(df)} linha(s) | Período: {period_label} | Palavra-chave: {keyword_label}")
 
             # ----------------------------
             # LISTAGEM
@@ -1616,49 +2352,64 @@ def do_main_app():
             if df.empty:
                 st.info("Nenhuma transação encontrada para os filtros selecionados.")
             else:
-                for _, row in df.iterrows():
+                # Uma página por vez (df já vem do mais novo p/ o mais antigo): a quantidade de
+                # containers/botões por rerun fica limitada a TX_PAGE_SIZE, qualquer que seja o total
+                n_tx = len(df)
+                n_pages = -(-n_tx // TX_PAGE_SIZE)
+                page = min(max(int(st.session_state.get("tx_page", 0)), 0), n_pages - 1)
+                df = df.iloc[page * TX_PAGE_SIZE:(page + 1) * TX_PAGE_SIZE]
+
+                # Textos de exibição calculados de uma vez (vetorizado), não linha a linha
+                # (data_fmt já vem parseado e sem NaT desde o df_all)
+                empty = pd.Series("", index=df.index)
+                desc_s = df.get("descricao", empty).fillna("").astype(str)
+                cat_s = df.get("categoria", empty).astype(object).fillna("").astype(str)
+                dash = pd.Series("-", index=df.index)
+                is_saida = df["tipo"].eq("Saída").to_numpy()
+                titulo_s = desc_s.where(desc_s != "", cat_s.where(cat_s != "", "(sem descrição)"))
+                valor_s = pd.to_numeric(df["valor"], errors="coerce").fillna(0.0).map("R$ {:,.2f}".format)
+                sinal = np.where(is_saida, "-", "+")
+                # só as colunas lidas no loop: evita copiar/boxear data_fmt (Timestamp) e extras em cada dict
+                list_cols = [c for c in ("id", "data", "tipo", "categoria", "valor", "descricao", "tempo") if c in df.columns]
+                df_view = df[list_cols].assign(
+                    _titulo_md="**" + titulo_s + "**",
+                    _caption=df["data_txt"] + " | " + cat_s.where(cat_s != "", "-"),
+                    _tempo_cap=np.where(is_saida, "⌛ " + df.get("tempo", dash).fillna("-").astype(str), ""),
+                    # texto colorido nativo do markdown (:red[...]/:green[...]); "$" escapado para não virar LaTeX
+                    _valor_md=np.where(is_saida, ":red[", ":green[") + sinal + valor_s.str.replace("$", "\\$", regex=False) + "]",
+                )
+
+                # Uma barra de ações por página (seleção + ✏️/🗑️) em vez de dois botões por linha:
+                # a quantidade de widgets não cresce com o número de transações exibidas
+                rotulos = dict(zip(df["id"], df["data_txt"] + " • " + titulo_s + " • " + sinal + valor_s))
+                a1, a2, a3 = st.columns([4, 1, 1], vertical_alignment="bottom")
+                a1.selectbox("Transação", options=list(rotulos), format_func=rotulos.get, key="tx_sel")
+                a2.button("✏️ Editar", key="btn_tx_edit", on_click=_tx_row_action, args=("edit", username), use_container_width=True)
+                a3.button("🗑️ Excluir", key="btn_tx_del", on_click=_tx_row_action, args=("delete", username), use_container_width=True)
+
+                for row in df_view.to_dict("records"):  # dicts simples em vez de iterrows/Series por linha
                     with st.container(border=True):
-                        col1, col2, col3, col4 = st.columns([4, 2, 0.5, 0.5])
-
-                        tipo = row.get("tipo", "")
-                        color = "green" if tipo == "Entrada" else "red"
-
-                        titulo = row.get("descricao") or row.get("categoria") or "(sem descrição)"
-                        try:
-                            dt_show = parse_tx_datetime(row.get("data", ""))
-                            data_txt = dt_show.strftime("%d/%m/%Y %H:%M") if not pd.isna(dt_show) else str(row.get("data", ""))[:16]
-                        except Exception:
-                            data_txt = str(row.get("data", ""))[:16]
-                        categoria = row.get("categoria", "-")
-
-                        col1.markdown(f"**{titulo}**")
-                        col1.caption(f"{data_txt} | {categoria}")
-
-                        txt_valor = f"R$ {float(row.get('valor', 0.0)):,.2f}"
-                        if tipo == "Saída":
-                            col2.markdown(f"<span style='color:{color}'>-{txt_valor}</span>", unsafe_allow_html=True)
-                            col2.caption(f"⌛ {row.get('tempo', '-')}")
-                        else:
-                            col2.markdown(f"<span style='color:{color}'>+{txt_valor}</span>", unsafe_allow_html=True)
-
-                        if col3.button("✏️", key=f"edit_{row['id']}"):
-                            st.session_state.editing_item = {
-                                "id": row["id"],
-                                "data": row.get("data"),
-                                "tipo": row.get("tipo"),
-                                "categoria": row.get("categoria"),
-                                "valor": float(row.get("valor", 0.0)),
-                                "descricao": row.get("descricao", ""),
-                                "tempo": row.get("tempo", "-"),
-                            }
-                            st.session_state.tx_tab = "Novo Lançamento"
-                            st.rerun()
+                        col1, col2 = st.columns([4, 2])
 
-                        if col4.button("🗑️", key=f"del_{row['id']}"):
-                            delete_financial_item(row["id"])
-                            st.session_state.tx_last_result = {"ok": True, "msg": "Transação excluída com sucesso! 🗑️"}
-                            st.session_state.tx_tab = "Registros"
-                            st.rerun()
+                        col1.markdown(row["_titulo_md"])
+                        col1.caption(row["_caption"])
+
+                        col2.markdown(row["_valor_md"])
+                        if row["_tempo_cap"]:
+                            col2.caption(row["_tempo_cap"])
+
+                if n_pages > 1:
+                    p1, p2, p3 = st.columns([1, 2, 1])
+                    p1.button(
+                        "◀ Anterior", key="btn_tx_prev", disabled=page == 0,
+                        on_click=_set_page, args=("tx_page", page - 1),
+                    )
+                    first = page * TX_PAGE_SIZE + 1
+                    p2.caption(f"Página {page + 1} de {n_pages} • transações {first}–{first + len(df) - 1} de {n_tx}")
+                    p3.button(
+                        "Próxima ▶", key="btn_tx_next", disabled=page >= n_pages - 1,
+                        on_click=_set_page, args=("tx_page", page + 1),
+                    )
 
 
     # ---------------------------
@@ -1685,7 +2436,7 @@ def do_main_app():
             # Cálculo base
             # ============================
             total_h = (v_compra / valor_hora) if valor_hora > 0 else 0.0
-            h, m = int(total_h), int((total_h - int(total_h)) * 60)
+            h, m = divmod(int(round(total_h * 60)), 60)
 
             dias_trabalho = total_h / 8
             pct_mes = (v_compra / renda * 100) if renda > 0 else 0.0
@@ -1735,7 +2486,7 @@ def do_main_app():
             # Ação consciente
             # ============================
             if st.button("Registrar como Gasto Consciente"):
-                tid = str(datetime.now().timestamp())
+                tid = secrets.token_hex(8)
                 item = {
                     "id": tid,
                     "data": datetime.now().isoformat(),
@@ -1743,7 +2494,7 @@ def do_main_app():
                     "categoria": "Lazer",
                     "valor": float(v_compra),
                     "descricao": "Gasto consciente",
-                    "tempo": f"{h}h {m}m",
+                    "tempo": fmt_tempo(total_h),
                 }
                 save_financial_item(username, item, protector)
                 st.toast("Gasto registrado com consciência 🧠")
@@ -1784,7 +2535,7 @@ def do_main_app():
             new_schedule = {}
 
             def to_time(s):
-                return datetime.strptime(s, "%H:%M").time()
+                return time(*parse_hhmm(s))
 
             sched = profile.get("daily_schedule", {})
             if not dias_f:
@@ -1813,11 +2564,10 @@ def do_main_app():
                 st.success("Rotina atualizada!")
                 st.rerun()
 
-        # Atualiza valor hora exibido em tempo real
-        profile2 = get_user_profile(username, protector)
-        renda2, _, _, valor_hora2 = compute_valor_hora(profile2)
-        if valor_hora2 > 0:
-            st.metric("Sua hora vale", f"R$ {valor_hora2:.2f}")
+        # Valor hora do perfil salvo: já calculado no topo deste rerun (salvar chama st.rerun(),
+        # então não há gravação entre aquele cálculo e este ponto)
+        if valor_hora > 0:
+            st.metric("Sua hora vale", f"R$ {valor_hora:.2f}")
 
     # ---------------------------
     # GESTÃO DE METAS (GOALS)
@@ -1834,240 +2584,13 @@ def do_main_app():
                 if not n_m.strip():
                     st.error("Dê um nome para a meta.")
                 else:
-                    gid = str(datetime.now().timestamp())
+                    gid = secrets.token_hex(8)
                     g = {"id": gid, "nome": n_m, "tipo": t_m, "objetivo": float(v_m), "atual": 0.0, "historico": []}
                     save_goal(username, g, protector)
                     st.toast("Meta criada! 🎯")
                     st.rerun()
 
-        metas = get_goals(username, protector)
-        if not metas:
-            st.info("Você ainda não criou metas.")
-            return
-
-        st.subheader("📌 Suas metas")
-        for m in metas:
-            with st.container(border=True):
-                col1, col2, col3 = st.columns([3, 2, 1])
-                prog = min(float(m.get("atual", 0.0)) / max(float(m.get("objetivo", 0.1)), 0.1), 1.0)
-                col1.markdown(f"### {m.get('nome','(sem nome)')} ({m.get('tipo','-')})")
-                col2.metric("Saldo", f"R$ {float(m.get('atual',0.0)):,.2f}", f"{prog*100:.1f}%")
-                col2.progress(prog)
-                if col3.button("Gerenciar", key=f"btn_{m['id']}"):
-                    st.session_state.active_goal = m["id"]
-                    st.rerun()
-
-        if st.session_state.active_goal:
-            goal = next((x for x in metas if x["id"] == st.session_state.active_goal), None)
-            if not goal:
-                st.session_state.active_goal = None
-                st.rerun()
-
-            st.divider()
-            st.header(f"Configurações: {goal['nome']}")
-
-            tab_mov, tab_edit, tab_hist = st.tabs(["💸 Movimentar", "⚙️ Editar Meta", "📜 Histórico"])
-
-            with tab_mov:
-                c_in, c_viz = st.columns([1, 2])
-
-                with c_in:
-                    st.subheader("Movimentação")
-
-                    help_toggle_button(
-                        key=f"meta_mov_{goal['id']}",
-                        title="Como funcionam Aporte, Retirada e Balanço?",
-                        content_md=(
-                            "**Aporte**: adiciona dinheiro na meta.\n\n"
-                            "**Retirada**: remove dinheiro da meta (não deixa ficar negativo).\n\n"
-                            "**Balanço (correção)**: você informa o **saldo real atual** da meta.\n"
-                            "O sistema calcula a diferença:\n"
-                            "- Se o saldo real for maior → registra **Aporte** da diferença.\n"
-                            "- Se o saldo real for menor → registra **Retirada** da diferença.\n"
-                            "Assim você corrige sem fazer contas."
-                        ),
-                    )
-
-                    # ✅ Tipo agora tem Balanço inteligente
-                    tipo = st.selectbox("Operação", ["Aporte", "Retirada", "Balanço (correção)"], key=f"t_mov_{goal['id']}")
-
-                    # ✅ Data/Hora (para TODOS: aporte/retirada/balanço)
-                    now = datetime.now()
-                    cdt1, cdt2 = st.columns([2, 1])
-                    g_date = cdt1.date_input("Data da operação", value=now.date(), key=f"g_date_{goal['id']}")
-                    g_time = cdt2.time_input("Hora", value=now.time().replace(second=0, microsecond=0), key=f"g_time_{goal['id']}")
-                    g_dt = datetime.combine(g_date, g_time)
-
-                    desc = st.text_area("Descrição/Origem", key=f"d_mov_{goal['id']}")
-
-                    # Campos variam conforme tipo
-                    if tipo == "Balanço (correção)":
-                        saldo_atual_sistema = float(goal.get("atual", 0.0))
-                        st.caption(f"Saldo calculado da meta agora: **{_brl(saldo_atual_sistema)}**")
-
-                        saldo_informado = st.number_input(
-                            "Qual é o saldo real atual dessa meta (R$)?",
-                            min_value=0.0,
-                            step=10.0,
-                            key=f"saldo_real_{goal['id']}",
-                        )
-
-                        if st.button("Aplicar Balanço", key=f"btn_bal_{goal['id']}"):
-                            delta = float(saldo_informado) - float(saldo_atual_sistema)
-
-                            if abs(delta) < 0.005:
-                                st.info("✅ O saldo informado já bate com o saldo atual da meta. Nenhuma correção necessária.")
-                                st.stop()
-
-                            # delta > 0 => aporte; delta < 0 => retirada
-                            op = "Aporte" if delta > 0 else "Retirada"
-                            v = abs(delta)
-
-                            # retirada não pode deixar negativo
-                            if op == "Retirada" and v > float(goal.get("atual", 0.0)):
-                                st.error(
-                                    f"Operação negada! A correção deixaria saldo negativo. "
-                                    f"(Atual: {_brl(float(goal.get('atual',0.0)))})"
-                                )
-                                st.stop()
-
-                            goal["historico"].append(
-                                {
-                                    "uid": str(datetime.now().timestamp()),
-                                    "data": g_dt.isoformat(),          # ✅ data/hora escolhida
-                                    "tipo": op,                         # ✅ registra como Aporte/Retirada
-                                    "valor": float(v),
-                                    "descricao": (desc or "Balanço (correção)"),
-                                }
-                            )
-                            goal = rebuild_goal_state(goal)
-                            save_goal(username, goal, protector)
-                            st.success(f"Balanço aplicado! Registrado como **{op}** de **{_brl(v)}**.")
-                            st.rerun()
-
-                    else:
-                        # Aporte / Retirada (normal)
-                        valor = st.number_input("Valor R$", min_value=0.0, step=10.0, key=f"v_mov_{goal['id']}")
-
-                        if st.button("Registrar", key=f"btn_reg_mov_{goal['id']}"):
-                            if float(valor) <= 0:
-                                st.error("O valor precisa ser maior que zero.")
-                                st.stop()
-
-                            if tipo == "Retirada" and float(valor) > float(goal.get("atual", 0.0)):
-                                st.error(
-                                    f"Operação negada! Saldo insuficiente "
-                                    f"(Atual: {_brl(float(goal.get('atual',0.0)))})"
-                                )
-                                st.stop()
-
-                            goal["historico"].append(
-                                {
-                                    "uid": str(datetime.now().timestamp()),
-                                    "data": g_dt.isoformat(),          # ✅ data/hora escolhida
-                                    "tipo": tipo,                       # "Aporte" ou "Retirada"
-                                    "valor": float(valor),
-                                    "descricao": desc,
-                                }
-                            )
-                            goal = rebuild_goal_state(goal)
-                            save_goal(username, goal, protector)
-                            st.success("Registrado!")
-                            st.rerun()
-
-                with c_viz:
-                    if goal.get("historico"):
-                        df = pd.DataFrame(goal["historico"])
-                        df["data_dt"] = parse_tx_datetime(df["data"]).dt.date
-                        df_daily = df.groupby("data_dt").last().reset_index()
-                        fig = px.line(df_daily, x="data_dt", y="valor_acumulado", markers=True)
-                        st.plotly_chart(fig, use_container_width=True)
-                    else:
-                        st.info("Sem histórico ainda.")
-
-            with tab_edit:
-                st.subheader("Ajustes da Meta")
-                new_n = st.text_input("Renomear Meta", value=goal.get("nome", ""), key="edit_nome")
-                new_o = st.number_input("Alterar Objetivo", value=float(goal.get("objetivo", 0.0)), step=50.0, key="edit_obj")
-
-                if float(goal.get("atual", 0.0)) >= float(goal.get("objetivo", 0.0)) and float(goal.get("objetivo", 0.0)) > 0:
-                    st.success("🎯 Objetivo Atingido! Deseja expandir?")
-                    c1, c2 = st.columns(2)
-                    if c1.button("Dobrar Meta (2x)", key="btn_dobrar"):
-                        goal["objetivo"] = float(goal["objetivo"]) * 2
-                        save_goal(username, goal, protector)
-                        st.rerun()
-                    if c2.button("Aumentar 50% (1.5x)", key="btn_50"):
-                        goal["objetivo"] = float(goal["objetivo"]) * 1.5
-                        save_goal(username, goal, protector)
-                        st.rerun()
-
-                if st.button("Salvar Alterações", key="btn_salvar_meta"):
-                    goal["nome"] = new_n
-                    goal["objetivo"] = float(new_o)
-                    save_goal(username, goal, protector)
-                    st.toast("Meta atualizada.")
-                    st.rerun()
-
-                if goal.get("is_default"):
-                    st.warning("🚫 Esta é a meta padrão do sistema e não pode ser excluída.")
-                else:
-                    if st.button("Excluir Meta", type="primary", key="btn_excluir_meta"):
-                        delete_goal(username, goal["id"], protector)
-                        st.session_state.active_goal = None
-                        st.toast("Meta excluída.")
-                        st.rerun()
-
-            with tab_hist:
-                st.subheader("Gerenciar Registros")
-                if goal.get("historico"):
-                    for i, entry in enumerate(reversed(goal["historico"])):
-                        idx = len(goal["historico"]) - 1 - i
-                        with st.expander(f"{entry['data'][:10]} - {entry['tipo']}: R$ {float(entry['valor']):,.2f}"):
-                            new_v = st.number_input("Valor", value=float(entry["valor"]), step=10.0, key=f"v_{entry['uid']}")
-                            new_d = st.text_area("Descrição", value=entry.get("descricao", ""), key=f"d_{entry['uid']}")
-
-                            # ✅ editar data/hora do registro
-                            try:
-                                dt_old = parse_tx_datetime(entry.get("data", ""))
-                                if pd.isna(dt_old):
-                                    dt_old = datetime.now()
-                            except Exception:
-                                dt_old = datetime.now()
-
-                            ccdt1, ccdt2 = st.columns([2, 1])
-                            new_date = ccdt1.date_input("Data", value=dt_old.date(), key=f"dt_{entry['uid']}")
-                            new_time = ccdt2.time_input("Hora", value=dt_old.time().replace(second=0, microsecond=0), key=f"tm_{entry['uid']}")
-                            new_dt = datetime.combine(new_date, new_time)
-
-                            cc1, cc2 = st.columns(2)
-                            if cc1.button("Salvar Edição", key=f"s_{entry['uid']}"):
-                                goal["historico"][idx]["valor"] = float(new_v)
-                                goal["historico"][idx]["descricao"] = new_d
-                                goal["historico"][idx]["data"] = new_dt.isoformat()
-                                goal = rebuild_goal_state(goal)
-
-                                # Checa saldo negativo em algum ponto
-                                if any(float(h.get("valor_acumulado", 0.0)) < 0 for h in goal["historico"]):
-                                    st.error("Erro: essa alteração deixaria o saldo negativo em algum ponto do histórico!")
-                                    st.rerun()
-                                else:
-                                    save_goal(username, goal, protector)
-                                    st.toast("Registro atualizado.")
-                                    st.rerun()
-
-                            if cc2.button("Excluir Registro", key=f"del_{entry['uid']}", type="primary"):
-                                goal["historico"].pop(idx)
-                                goal = rebuild_goal_state(goal)
-                                save_goal(username, goal, protector)
-                                st.toast("Registro excluído.")
-                                st.rerun()
-                else:
-                    st.info("Sem registros.")
-
-            if st.button("Fechar Painel", key="btn_fechar_painel"):
-                st.session_state.active_goal = None
-                st.rerun()
+        render_goals_section(username, protector)
 
 # Router
 if not st.session_state.logged_in: